@@ -0,0 +1,112 @@
+"""
+Summarises the event log written by `errors.event`, printing how long
+each operation took at the 50th, 95th and 99th percentiles.
+
+Usage:
+    python analyze_events.py [events file ...] [--op NAME]
+
+Reads elysium.events.jsonl and its rotated copies by default.
+"""
+from __future__ import annotations
+import argparse
+import glob
+import json
+import math
+import sys
+from typing import Any, Iterator
+
+
+def read_events(file_paths: list[str]) -> Iterator[dict[str, Any]]:
+    for file_path in file_paths:
+        try:
+            with open(file_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record: Any = json.loads(line)
+                    except ValueError:
+                        continue
+
+                    if isinstance(record, dict) and "op" in record and "ms" in record:
+                        yield record
+        except OSError as e:
+            print(f"Skipping {file_path!r}: {e}", file=sys.stderr)
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    """The nearest-rank percentile of `values`, which must be sorted."""
+    rank: int = max(1, math.ceil(fraction * len(values)))
+    return values[rank - 1]
+
+
+class Summary:
+    __slots__ = ("durations", "failures", "entries", "bytes")
+
+    def __init__(self) -> None:
+        self.durations: list[float] = []
+        self.failures: int = 0
+        self.entries: int = 0
+        self.bytes: int = 0
+
+    def add(self, record: dict[str, Any]) -> None:
+        self.durations.append(float(record["ms"]))
+        if record.get("ok") is False:
+            self.failures += 1
+        if isinstance(record.get("entries"), int):
+            self.entries += record["entries"]
+        if isinstance(record.get("bytes"), int):
+            self.bytes += record["bytes"]
+
+
+def summarise(records: Iterator[dict[str, Any]], operation: str | None = None) -> dict[str, Summary]:
+    summaries: dict[str, Summary] = {}
+    for record in records:
+        if operation is not None and record["op"] != operation:
+            continue
+
+        summaries.setdefault(record["op"], Summary()).add(record)
+
+    return summaries
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(
+        description="Prints p50/p95/p99 durations per operation"
+    )
+    parser.add_argument("files", nargs="*", help="Event logs to read")
+    parser.add_argument("--op", help="Only summarise this operation")
+    arguments: argparse.Namespace = parser.parse_args(argv)
+
+    file_paths: list[str] = arguments.files or sorted(
+        glob.glob("elysium.events.jsonl*"),
+        reverse=True
+    )
+    if not file_paths:
+        print("No event logs found", file=sys.stderr)
+        return 1
+
+    summaries: dict[str, Summary] = summarise(read_events(file_paths), arguments.op)
+    if not summaries:
+        print("No events found", file=sys.stderr)
+        return 1
+
+    print(
+        f"{'operation':<22}{'count':>8}{'failed':>8}{'p50 ms':>11}{'p95 ms':>11}"
+        + f"{'p99 ms':>11}{'max ms':>11}{'entries':>10}{'MB':>10}"
+    )
+    for operation, summary in sorted(summaries.items()):
+        durations: list[float] = sorted(summary.durations)
+        print(
+            f"{operation:<22}{len(durations):>8}{summary.failures:>8}"
+            + f"{percentile(durations, 0.50):>11.2f}"
+            + f"{percentile(durations, 0.95):>11.2f}"
+            + f"{percentile(durations, 0.99):>11.2f}"
+            + f"{durations[-1]:>11.2f}"
+            + f"{summary.entries:>10}"
+            + f"{summary.bytes / 1024 / 1024:>10.1f}"
+        )
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
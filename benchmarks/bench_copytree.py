@@ -0,0 +1,83 @@
+"""
+Compares `transfer.copytree` with `shutil.copytree` on a synthetic tree
+of many small files, the case where per-file latency rather than
+bandwidth sets the speed.
+
+Run from the repository root:
+    python benchmarks/bench_copytree.py [files] [workers] [directory]
+
+Pass a directory on a network mount to see the difference there; the
+default is a temporary folder.
+"""
+from __future__ import annotations
+import os
+import shutil
+import sys
+import tempfile
+import time
+from typing import Callable
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import errors #type: ignore - imported first to avoid a circular import
+import transfer
+
+
+def _build_tree(root: str, count: int, files_per_folder: int = 100) -> int:
+    """Writes `count` files of 1-8 KB, spread over nested folders."""
+    total: int = 0
+    for i in range(count):
+        folder: str = os.path.join(
+            root,
+            f"group{i // (files_per_folder * 10):03d}",
+            f"folder{i // files_per_folder:05d}"
+        )
+        if i % files_per_folder == 0:
+            os.makedirs(folder, exist_ok=True)
+
+        data: bytes = os.urandom(1024 * (1 + i % 8))
+        with open(os.path.join(folder, f"file{i:07d}.dat"), "wb") as f:
+            f.write(data)
+        total += len(data)
+
+    return total
+
+
+def _time(label: str, function: Callable[[], object], size: int) -> float:
+    started: float = time.perf_counter()
+    function()
+    elapsed: float = time.perf_counter() - started
+    rate: float = size / elapsed / 1024 / 1024 if elapsed else 0.0
+    print(f"{label:<32}{elapsed * 1000:>10.1f} ms{rate:>10.1f} MB/s")
+    return elapsed
+
+
+def main(count: int = 20_000, workers: int = 8, directory: str | None = None) -> None:
+    with tempfile.TemporaryDirectory(dir=directory) as root:
+        source: str = os.path.join(root, "source")
+        size: int = _build_tree(source, count)
+        print(f"{count} files, {size / 1024 / 1024:.1f} MB, in {root}")
+
+        baseline: float = _time(
+            "shutil.copytree",
+            lambda: shutil.copytree(source, os.path.join(root, "shutil")),
+            size
+        )
+        parallel: float = _time(
+            f"transfer.copytree ({workers} workers)",
+            lambda: transfer.copytree(
+                source,
+                os.path.join(root, "parallel"),
+                max_workers=workers
+            ),
+            size
+        )
+        print(f"{'speedup':<32}{baseline / parallel:>12.2f}x")
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 20_000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 8,
+        sys.argv[3] if len(sys.argv) > 3 else None
+    )
@@ -0,0 +1,110 @@
+"""
+Times the `files.Path` operations a large directory listing leans on:
+building the paths, sorting them, hashing them into a dict, comparing
+them and splitting them into components.
+
+Each operation is timed against `_BaselinePath` as well, a copy of the
+relevant parts of `Path` as it was before its derived forms were cached
+and its attributes slotted, and the speedup is printed alongside.
+
+Run from the repository root:
+    python benchmarks/bench_paths.py [entries]
+"""
+from __future__ import annotations
+import os
+import sys
+import time
+from typing import Callable
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import errors #type: ignore - imported first to avoid a circular import
+import files
+from files import Path
+
+
+class _BaselinePath:
+    """`Path` without `__slots__` or caching, resolving itself every time."""
+    def __init__(self, path: str) -> None:
+        self._separator: str = '\\' if files.platform() == "windows" else '/'
+        self._path: str = path or ""
+
+    def as_list(self) -> list[str]:
+        list_version: list[str] = [
+            x.strip()
+            for x in self.path.split(self._separator)
+        ]
+        while '' in list_version:
+            list_version.remove('')
+
+        if self.path.startswith(self._separator):
+            list_version.insert(0, self._separator)
+        return list_version
+
+    @property
+    def path(self) -> str:
+        return files.resource_path(self._path)
+
+    def __str__(self) -> str:
+        return str(self.path)
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, _BaselinePath):
+            return self.path == other.path
+        return False
+
+    def __len__(self) -> int:
+        return len(self.as_list())
+
+    def __lt__(self, other: _BaselinePath) -> bool:
+        return self.path.lower() < other.path.lower()
+
+    def __hash__(self) -> int:
+        return hash(self.path)
+
+
+def _time(function: Callable[[], object]) -> float:
+    started: float = time.perf_counter()
+    function()
+    return time.perf_counter() - started
+
+
+def _operations(
+    names: list[str],
+    path_type: Callable[[str], object]
+) -> dict[str, float]:
+    paths: list[object] = []
+    return {
+        "construct": _time(lambda: paths.extend(path_type(x) for x in names)),
+        "sort": _time(lambda: sorted(paths)), #type: ignore
+        "dict by path": _time(lambda: {x: None for x in paths}),
+        "equality": _time(lambda: [a == b for a, b in zip(paths, paths[1:])]),
+        "len (components)": _time(lambda: [len(x) for x in paths]), #type: ignore
+        "str": _time(lambda: [str(x) for x in paths]),
+    }
+
+
+def main(count: int = 100_000) -> None:
+    names: list[str] = [f"Item {i % 997:03d} - {i}.txt" for i in range(count)]
+
+    baseline: dict[str, float] = _operations(names, _BaselinePath)
+    current: dict[str, float] = _operations(names, Path)
+
+    print(f"files.Path with {count} entries")
+    print(f"{'':<20}{'baseline ms':>14}{'files.Path ms':>16}{'speedup':>10}")
+    for name in baseline:
+        print(
+            f"{name:<20}{baseline[name] * 1000:>14.1f}{current[name] * 1000:>16.1f}"
+            + f"{baseline[name] / current[name] if current[name] else 0.0:>9.1f}x"
+        )
+
+    total_baseline: float = sum(baseline.values())
+    total_current: float = sum(current.values())
+    print(
+        f"{'total':<20}{total_baseline * 1000:>14.1f}{total_current * 1000:>16.1f}"
+        + f"{total_baseline / total_current:>9.1f}x"
+    )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
@@ -0,0 +1,216 @@
+from __future__ import annotations
+from collections import OrderedDict
+import json
+import mmap
+import os
+import threading
+
+
+# (offset, magic bytes, extension). Checked in order, so more specific
+# signatures come before the ones they share a prefix with.
+SIGNATURES: tuple[tuple[int, bytes, str], ...] = (
+    (0, b"%PDF-", "pdf"),
+    (0, b"\x89PNG\r\n\x1a\n", "png"),
+    (0, b"\xff\xd8\xff", "jpg"),
+    (0, b"GIF87a", "gif"),
+    (0, b"GIF89a", "gif"),
+    (0, b"BM", "bmp"),
+    (0, b"II*\x00", "tiff"),
+    (0, b"MM\x00*", "tiff"),
+    (8, b"WEBP", "webp"),
+    (4, b"ftypheic", "heic"),
+    (4, b"ftypM4A", "m4a"),
+    (4, b"ftypqt", "mov"),
+    (4, b"ftyp", "mp4"),
+    (8, b"AVI ", "avi"),
+    (8, b"WAVE", "wav"),
+    (0, b"ID3", "mp3"),
+    (0, b"\xff\xfb", "mp3"),
+    (0, b"OggS", "ogg"),
+    (0, b"fLaC", "flac"),
+    (0, b"\x1aE\xdf\xa3", "mkv"),
+    (0, b"Rar!\x1a\x07", "rar"),
+    (0, b"7z\xbc\xaf\x27\x1c", "7z"),
+    (0, b"\x1f\x8b", "gz"),
+    (0, b"BZh", "bz2"),
+    (0, b"\xfd7zXZ\x00", "xz"),
+    (257, b"ustar", "tar"),
+    (0, b"MZ", "exe"),
+    (0, b"\x7fELF", "bin"),
+    (0, b"SQLite format 3\x00", "sqlite"),
+    (0, b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1", "doc"),
+    (0, b"{\\rtf", "rtf"),
+    (0, b"wOFF", "woff"),
+    (0, b"wOF2", "woff2"),
+    (0, b"OTTO", "otf"),
+    (0, b"\x00\x01\x00\x00\x00", "ttf"),
+)
+
+# Magics made of a few letters, which ordinary text can start with too
+# ("BMW service notes"). They only count when the header is not text;
+# the real formats put binary fields, with NUL bytes, right after them.
+TEXT_LIKE_MAGICS: frozenset[bytes] = frozenset({b"BM", b"ID3", b"OTTO", b"BZh", b"MZ"})
+
+# Office Open XML, OpenDocument and EPUB files are all zip archives, so
+# they are told apart by the names near the start of the archive.
+_ZIP_MEMBERS: tuple[tuple[bytes, str], ...] = (
+    (b"application/epub+zip", "epub"),
+    (b"application/vnd.oasis.opendocument.text", "odt"),
+    (b"application/vnd.oasis.opendocument.spreadsheet", "ods"),
+    (b"application/vnd.oasis.opendocument.presentation", "odp"),
+    (b"word/", "docx"),
+    (b"xl/", "xlsx"),
+    (b"ppt/", "pptx"),
+)
+
+
+# Results that say too little about a file to overrule its extension:
+# a .docx is also a zip, and a .csv is also text.
+WEAK_MATCHES: frozenset[str] = frozenset({"zip", "txt", "sh", "bin", "exe"})
+
+
+def sniff_bytes(header: bytes) -> str | None:
+    """
+    Guesses an extension from the first bytes of a file. Text that
+    decodes as UTF-8 with no NUL bytes is reported as "txt", or "sh"
+    with a shebang; anything else unrecognised gives None.
+    """
+    if header.startswith(b"PK\x03\x04"):
+        for member, extension in _ZIP_MEMBERS:
+            if member in header:
+                return extension
+        return "zip"
+
+    text: bool = _is_text(header)
+    for offset, magic, extension in SIGNATURES:
+        if header.startswith(magic, offset):
+            if text and magic in TEXT_LIKE_MAGICS:
+                break
+            return extension
+
+    if not text:
+        return None
+
+    return "sh" if header.startswith(b"#!") else "txt"
+
+
+def _is_text(header: bytes) -> bool:
+    """Whether `header` decodes as UTF-8 and has no NUL bytes."""
+    if not header or b"\x00" in header:
+        return False
+
+    try:
+        header.decode("utf-8")
+    except UnicodeDecodeError as e:
+        # A multi-byte character cut off at the end of the header is
+        # still text.
+        if e.start < len(header) - 3:
+            return False
+
+    return True
+
+
+class ContentSniffer:
+    """
+    Classifies files by their content rather than their name.
+
+    Only the first `header_size` bytes are read. Files larger than
+    `mmap_threshold` are mapped instead, with the mapping limited to the
+    header, so nothing past it is read. Results are cached by (device,
+    inode, size, mtime), so a file that has not changed is never read
+    twice, and the cache can be saved between runs.
+    """
+    def __init__(
+        self,
+        cache_path: str | None = None,
+        header_size: int = 4096,
+        mmap_threshold: int = 1024 * 1024,
+        max_cached: int = 200_000
+    ) -> None:
+        self.cache_path: str | None = cache_path
+        self.header_size: int = header_size
+        self.mmap_threshold: int = mmap_threshold
+        self.max_cached: int = max_cached
+        self.reads: int = 0
+
+        self._cache: OrderedDict[str, str | None] = OrderedDict()
+        self._lock: threading.Lock = threading.Lock()
+        self._dirty: bool = False
+
+        if cache_path is not None:
+            self.load()
+
+    def sniff(self, file_path: str, stats: os.stat_result | None = None) -> str | None:
+        """Returns the extension `file_path`'s content looks like, if any."""
+        try:
+            stats = stats or os.stat(file_path)
+        except OSError:
+            return None
+
+        key: str = (
+            f"{stats.st_dev}:{stats.st_ino}:{stats.st_size}:{stats.st_mtime_ns}"
+        )
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+
+        try:
+            extension: str | None = sniff_bytes(self._read_header(file_path, stats))
+        except OSError:
+            return None
+
+        with self._lock:
+            self._cache[key] = extension
+            self._dirty = True
+            while len(self._cache) > self.max_cached:
+                self._cache.popitem(last=False)
+
+        return extension
+
+    def load(self) -> None:
+        if self.cache_path is None:
+            return
+
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                cached: dict[str, str | None] = json.load(f)
+        except (OSError, ValueError):
+            return
+
+        with self._lock:
+            self._cache = OrderedDict(cached)
+
+    def save(self) -> None:
+        """Writes the cache back to `cache_path`, if it has changed."""
+        if self.cache_path is None or not self._dirty:
+            return
+
+        with self._lock:
+            cached: dict[str, str | None] = dict(self._cache)
+            self._dirty = False
+
+        temporary_path: str = self.cache_path + ".tmp"
+        with open(temporary_path, "w", encoding="utf-8") as f:
+            json.dump(cached, f)
+
+        os.replace(temporary_path, self.cache_path)
+
+    def _read_header(self, file_path: str, stats: os.stat_result) -> bytes:
+        self.reads += 1
+        if stats.st_size == 0:
+            return b""
+
+        with open(file_path, "rb") as f:
+            if stats.st_size < self.mmap_threshold:
+                return f.read(self.header_size)
+
+            with mmap.mmap(
+                f.fileno(),
+                length=min(stats.st_size, self.header_size),
+                access=mmap.ACCESS_READ
+            ) as mapped:
+                return mapped[:self.header_size]
+
+    def __len__(self) -> int:
+        return len(self._cache)
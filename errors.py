@@ -1,12 +1,24 @@
+import atexit
+from contextlib import contextmanager
 from copy import deepcopy
 from datetime import datetime
+import json
+import os
+import queue
 import sys
-from typing import NoReturn
+import threading
+import time
+from typing import Any, Callable, Iterator, NoReturn, TextIO
 import customtkinter as ctk #type: ignore
 from CTkMessagebox import CTkMessagebox #type: ignore
 import gui #type: ignore
 
 
+# A message, or a function that builds it, called only if it will be logged.
+Message = str | Callable[[], str]
+_Record = tuple[float, str, str, str, str, tuple[object, ...]] | dict[str, Any] | threading.Event
+
+
 class Colors:
     def __init__(
         self,
@@ -22,6 +34,288 @@ class Colors:
         self.critical: str = critical
         self.emergency: str = emergency
 
+
+class _LogWriter:
+    """
+    Writes log lines to the log file and stdout on a background thread.
+
+    Logging a line only puts it on a queue, with the time it was logged
+    and any %-style arguments; the timestamp and message are formatted
+    and the line written by the writer thread.
+    Whatever has queued up while it was writing is written in one batch,
+    with one flush, so a burst of logging costs a single write. The log
+    file is kept open between batches and rotated to `.1`, `.2` and so on
+    once it grows past `max_bytes`, keeping `backups` old files.
+
+    Events from `event` and `timed` go the same way, as JSON lines in
+    `events_file`, which is rotated the same way.
+    """
+    def __init__(
+        self,
+        max_bytes: int = 5 * 1024 * 1024,
+        backups: int = 3,
+        batch_size: int = 512
+    ) -> None:
+        self.max_bytes: int = max_bytes
+        self.backups: int = backups
+        self.batch_size: int = batch_size
+
+        self._queue: queue.SimpleQueue[_Record] = queue.SimpleQueue()
+        self._thread: threading.Thread | None = None
+        self._start_lock: threading.Lock = threading.Lock()
+        self._files: dict[str, TextIO] = {}
+        # Batches that could not be written. The first failure is
+        # reported on stderr, since the log itself may be what failed.
+        self.write_failures: int = 0
+
+    def put(
+        self,
+        level: str,
+        color: str,
+        title: str,
+        message: str,
+        args: tuple[object, ...] = ()
+    ) -> None:
+        if self._thread is None:
+            self._start()
+
+        self._queue.put((time.time(), level, color, title, message, args))
+
+    def put_event(self, record: dict[str, Any]) -> None:
+        if self._thread is None:
+            self._start()
+
+        self._queue.put(record)
+
+    def flush(self, timeout: float | None = 5.0) -> None:
+        """Waits until every line logged so far has been written."""
+        if self._thread is None or not self._thread.is_alive():
+            return
+
+        written: threading.Event = threading.Event()
+        self._queue.put(written)
+        written.wait(timeout)
+
+    def _start(self) -> None:
+        with self._start_lock:
+            if self._thread is not None:
+                return
+
+            self._thread = threading.Thread(
+                target=self._run,
+                name="log-writer",
+                daemon=True
+            )
+            self._thread.start()
+            atexit.register(self.flush)
+
+    def _run(self) -> None:
+        while True:
+            batch: list[_Record] = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            lines: list[str] = []
+            colored: list[str] = []
+            events: list[str] = []
+            waiting: list[threading.Event] = []
+
+            for record in batch:
+                if isinstance(record, threading.Event):
+                    waiting.append(record)
+                    continue
+
+                # One bad record must not stop the writer, or every line
+                # after it would be lost.
+                try:
+                    if isinstance(record, dict):
+                        events.append(json.dumps(record, default=str))
+                        continue
+
+                    line, colored_line = self._format(record)
+                except Exception as e:
+                    line = colored_line = (
+                        f"{datetime.now().strftime('%d-%m-%Y %H:%M:%S.%f')} "
+                        + "WARN Logging - A log record could not be written: "
+                        + f"{type(e).__name__}: {e}"
+                    )
+
+                lines.append(line)
+                colored.append(colored_line)
+
+            try:
+                self._write(_current_log_file(), lines)
+                self._write(events_file, events)
+                if colored:
+                    sys.stdout.write('\n'.join(colored) + '\n')
+                    sys.stdout.flush()
+            except Exception as e:
+                self.write_failures += 1
+                if self.write_failures == 1:
+                    print(
+                        f"Elysium could not write its log: {type(e).__name__}: {e}",
+                        file=sys.stderr
+                    )
+
+            for written in waiting:
+                written.set()
+
+    def _format(
+        self,
+        record: tuple[float, str, str, str, str, tuple[object, ...]]
+    ) -> tuple[str, str]:
+        created, level, color, title, message, args = record
+        current_date: str = datetime.fromtimestamp(created).strftime(
+            "%d-%m-%Y %H:%M:%S.%f"
+        )
+        title, message = _for_display(title, message, args)
+        line: str = f"{current_date} {level} {title} - {message}"
+
+        try:
+            return line, getattr(log_colors, color) + line + __reset_color__
+        except NameError:
+            return line, line + __reset_color__
+
+    def _write(self, file_path: str, lines: list[str]) -> None:
+        if not lines:
+            return
+
+        file: TextIO | None = self._files.get(file_path)
+        if file is None:
+            file = self._files[file_path] = open(file_path, 'a')
+
+        file.write('\n'.join(lines) + '\n')
+        file.flush()
+
+        if file.tell() >= self.max_bytes:
+            self._rotate(file_path)
+
+    def _rotate(self, file_path: str) -> None:
+        self._files.pop(file_path).close()
+
+        for i in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{file_path}.{i}"):
+                os.replace(f"{file_path}.{i}", f"{file_path}.{i + 1}")
+
+        if self.backups > 0:
+            os.replace(file_path, f"{file_path}.1")
+        else:
+            os.remove(file_path)
+
+
+_writer: _LogWriter = _LogWriter()
+
+
+def _current_log_file() -> str:
+    try:
+        return log_file
+    except NameError:
+        return __log_file__
+
+
+def event(operation: str, duration: float, **fields: object) -> None:
+    """
+    Records one timed operation in the event log, for
+    `analyze_events.py`.
+
+    Args:
+        operation (str): What was timed, such as "populate_files".
+        duration (float): How long it took, in seconds.
+        **fields (object): Anything else worth aggregating, such as
+            `entries` or `bytes`. Values that are not JSON types are
+            written as strings.
+    """
+    if not log_events:
+        return
+
+    _writer.put_event({
+        "time": time.time(),
+        "op": operation,
+        "ms": round(duration * 1000, 3),
+        **fields
+    })
+
+
+@contextmanager
+def timed(operation: str, **fields: object) -> Iterator[dict[str, object]]:
+    """
+    Times the body of a `with` block and records it with `event`.
+
+    The yielded dict is written with the event, so counts only known at
+    the end can be added to it. If the block raises, the event gets
+    `"ok": False` and the exception's type, and the exception carries on.
+    """
+    started: float = time.perf_counter()
+    try:
+        yield fields
+    except BaseException as e:
+        fields["ok"] = False
+        fields["error"] = type(e).__name__
+        raise
+    finally:
+        event(operation, time.perf_counter() - started, **fields)
+
+
+def _legacy_log_message(
+    message: str,
+    args: tuple[object, ...],
+    log_message: str
+) -> tuple[tuple[object, ...], str]:
+    """
+    Lets callers keep passing `log_message` as the fourth positional
+    argument, as they could before %-style arguments were added. A
+    single string argument to a message with no `%` is taken as one.
+    """
+    if (
+        not log_message
+        and len(args) == 1
+        and isinstance(args[0], str)
+        and "%" not in message
+    ):
+        return (), args[0]
+
+    return args, log_message
+
+
+def _for_display(title: str, message: str, args: tuple[object, ...]) -> tuple[str, str]:
+    title = str(title)
+    message = str(message)
+    if args:
+        try:
+            message = message % args
+        except (TypeError, ValueError):
+            message = f"{message} {args!r}"
+
+    return title.replace('\n', ' '), message.replace('\n', ' ')
+
+
+def set_log_level(level: str) -> None:
+    """
+    Only logs messages at `level` or above, in the order of `LOG_LEVELS`.
+    Calls below it return before doing any formatting.
+    """
+    global log_values
+
+    level = level.strip().lower()
+    if level not in LOG_LEVELS:
+        warn(
+            None,
+            "Invalid log level",
+            f"{level!r} is not one of {', '.join(LOG_LEVELS)}"
+        )
+        return
+
+    log_values = LOG_LEVELS[LOG_LEVELS.index(level):]
+
+
+def is_enabled(level: str) -> bool:
+    """Whether messages at `level` are logged, for guarding costly messages."""
+    return level in log_values
+
+
 def rgb(
     red: int,
     green: int,
@@ -57,6 +351,7 @@ def confirm(
 
 
     if not root:
+        _writer.flush()
         print(f"CONFIRM: {title} - {message}")
         print(f"{options[0].title()} | {options[1].title()}")
         while (item := input('>> ').lower()) not in options:
@@ -82,42 +377,23 @@ def confirm(
 def warn(
     root: gui.App | None,
     title: str = "",
-    message: str = "",
+    message: Message = "",
+    *args: object,
     log_message: str = ""
 ) -> None | NoReturn:
     if "warn" not in log_values:
         return
 
     
-    current_date: str = datetime.now().strftime("%d-%m-%Y %H:%M:%S.%f")
-    title = title.replace('\n', ' ')
-    message = message.replace('\n', ' ')
-
-    
-    log_message = f"{current_date} WARN {title} - {log_message or message}"
-
-
-    try:
-        with open(log_file, 'a') as f:
-            print(log_message, file=f)
-        
-        print(
-            log_colors.warn
-            + log_message
-            + __reset_color__
-        )
-    except NameError:
-        with open(__log_file__, 'a') as f:
-            print(log_message, file=f)
-        
-        print(
-            log_message
-            + __reset_color__
-        )
+    if callable(message):
+        message = message()
+    args, log_message = _legacy_log_message(message, args, log_message)
+    _writer.put("WARN", "warn", title, log_message or message, args)
 
     if not root:
         return
     
+    title, message = _for_display(title, message, args)
 
     msg = CTkMessagebox(
         master=root.root,
@@ -137,37 +413,22 @@ def warn(
 def error(
     root: gui.App | None,
     title: str = "",
-    message: str = "",
+    message: Message = "",
+    *args: object,
     log_message: str = ""
 ) -> NoReturn:
     if "error" not in log_values:
         sys.exit()
 
 
-    current_date: str = datetime.now().strftime("%d-%m-%Y %H:%M:%S.%f")
-    title = title.replace('\n', ' ')
-    message = message.replace('\n', ' ')
-
-    log_message = f"{current_date} ERROR {title} - {log_message or message}"
-
-    try:
-        with open(log_file, 'a') as f:
-            print(log_message, file=f)
-        print(
-            log_colors.error
-            + log_message
-            + __reset_color__
-        )
-    except NameError:
-        with open(__log_file__, 'a') as f:
-            print(log_message, file=f)
-        
-        print(
-            log_message
-            + __reset_color__
-        )
+    if callable(message):
+        message = message()
+    args, log_message = _legacy_log_message(message, args, log_message)
+    _writer.put("ERROR", "error", title, log_message or message, args)
+    _writer.flush()
 
     if root:
+        title, message = _for_display(title, message, args)
         CTkMessagebox(
             master=root.root,
             title=f"ERROR: {title}",
@@ -182,38 +443,21 @@ def error(
 def info(
     root: gui.App | None,
     title: str = "",
-    message: str = "",
+    message: Message = "",
+    *args: object,
     log_message: str = ""
 ) -> None:
     if "info" not in log_values:
         return
 
 
-    current_date: str = datetime.now().strftime("%d-%m-%Y %H:%M:%S.%f")
-    title = title.replace('\n', ' ')
-    message = message.replace('\n', ' ')
-
-    log_message = f"{current_date} INFO {title} - {log_message or message}"
-
-    try:
-        with open(log_file, 'a') as f:
-            print(log_message, file=f)
-        
-        print(
-            log_colors.error
-            + log_message
-            + __reset_color__
-        )
-    except NameError:
-        with open(__log_file__, 'a') as f:
-            print(log_message, file=f)
-        
-        print(
-            log_message
-            + __reset_color__
-        )
+    if callable(message):
+        message = message()
+    args, log_message = _legacy_log_message(message, args, log_message)
+    _writer.put("INFO", "error", title, log_message or message, args)
 
     if root:
+        title, message = _for_display(title, message, args)
         CTkMessagebox(
             master=root.root,
             title=f"INFO: {title}",
@@ -227,38 +471,22 @@ def info(
 def critical(
     root: gui.App | None,
     title: str = "",
-    message: str = "",
+    message: Message = "",
+    *args: object,
     log_message: str = ""
 ) -> NoReturn:
     if "critical" not in log_values:
         sys.exit()
 
 
-    current_date: str = datetime.now().strftime("%d-%m-%Y %H:%M:%S.%f")
-    title = title.replace('\n', ' ')
-    message = message.replace('\n', ' ')
-
-    log_message = f"{current_date} CRITICAL {title} - {log_message or message}"
-
-    try:
-        with open(log_file, 'a') as f:
-            print(log_message, file=f)
-        
-        print(
-            log_colors.error
-            + log_message
-            + __reset_color__
-        )
-    except NameError:
-        with open(__log_file__, 'a') as f:
-            print(log_message, file=f)
-        
-        print(
-            log_message
-            + __reset_color__
-        )
+    if callable(message):
+        message = message()
+    args, log_message = _legacy_log_message(message, args, log_message)
+    _writer.put("CRITICAL", "error", title, log_message or message, args)
+    _writer.flush()
 
     if root:
+        title, message = _for_display(title, message, args)
         CTkMessagebox(
             master=root.root,
             title=f"CRITICAL: {title}",
@@ -273,37 +501,21 @@ def critical(
 def emergency(
     root: gui.App | None,
     title: str = "",
-    message: str = "",
+    message: Message = "",
+    *args: object,
     log_message: str = ""
 ) -> NoReturn:
     if "emergency" not in log_values:
         sys.exit()
     
-    current_date: str = datetime.now().strftime("%d-%m-%Y %H:%M:%S.%f")
-    title = title.replace('\n', ' ')
-    message = message.replace('\n', ' ')
-
-    log_message = f"{current_date} EMERGENCY {title} - {log_message or message}"
-
-    try:
-        with open(log_file, 'a') as f:
-            print(log_message, file=f)
-        
-        print(
-            log_colors.error
-            + log_message
-            + __reset_color__
-        )
-    except NameError:
-        with open(__log_file__, 'a') as f:
-            print(log_message, file=f)
-        
-        print(
-            log_message
-            + __reset_color__
-        )
+    if callable(message):
+        message = message()
+    args, log_message = _legacy_log_message(message, args, log_message)
+    _writer.put("EMERGENCY", "error", title, log_message or message, args)
+    _writer.flush()
 
     if root:
+        title, message = _for_display(title, message, args)
         CTkMessagebox(
             master=root.root,
             title=f"EMERGENCY: {title}",
@@ -328,4 +540,7 @@ __log_colors__: Colors = Colors(
 
 log_colors: Colors = deepcopy(__log_colors__)
 log_file: str = __log_file__
+events_file: str = "elysium.events.jsonl"
+log_events: bool = True
+LOG_LEVELS: tuple[str, ...] = ("info", "warn", "error", "critical", "emergency")
 log_values: tuple[str, ...] = ("emergency", "critical", "error", "info", "warn")
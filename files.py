@@ -5,10 +5,13 @@ import json
 import os
 import re
 import sys
-from typing import Any, Union
+import threading
+import time
+from typing import Any, Iterator, Union
 import psutil
 
 import errors
+import profiling
 from utils import platform
 
 if platform() == "windows":
@@ -18,9 +21,20 @@ else:
 
 
 class Path:
+    """
+    A file system path, as given, plus the forms derived from it.
+
+    The resolved path, its components and its sort key are each worked
+    out the first time they are needed and then kept, so paths can be
+    sorted, hashed and compared many times over without touching the
+    working directory again. They are reset whenever `path` is set.
+    """
+    __slots__ = ("_path", "_resolved", "_parts", "_sort_key")
+
+    _separator: str = '\\' if platform() == "windows" else '/'
+
     def __init__(self, path: str | list[str] | None = None) -> None:
         path = path or ""
-        self._separator: str = '\\' if platform() == "windows" else '/'
         if isinstance(path, list):
             while '' in path:
                 path.remove('')
@@ -29,22 +43,41 @@ class Path:
             if path.startswith(self.separator+self.separator):
                 path = path[1:]
         
-        self._path: str = path
+        self._path: str = sys.intern(path)
+        self._resolved: str | None = None
+        self._parts: tuple[str, ...] | None = None
+        self._sort_key: str | None = None
 
     def to_dict(self) -> dict[str, str]:
         return {"path": self.path}
     
     def as_list(self) -> list[str]:
-        list_version: list[str] = [
-            x.strip() 
-            for x in self.path.split(self._separator)
-        ]
-        while '' in list_version:
-            list_version.remove('')
-
-        if self.path.startswith(self.separator):
-            list_version.insert(0, self.separator)
-        return list_version
+        return list(self.parts)
+
+    @property
+    def parts(self) -> tuple[str, ...]:
+        """The path's components, as returned by `as_list`."""
+        if self._parts is None:
+            list_version: list[str] = [
+                x.strip() 
+                for x in self.path.split(self._separator)
+            ]
+            while '' in list_version:
+                list_version.remove('')
+
+            if self.path.startswith(self.separator):
+                list_version.insert(0, self.separator)
+            self._parts = tuple(list_version)
+
+        return self._parts
+
+    @property
+    def sort_key(self) -> str:
+        """The casefolded resolved path, used for ordering."""
+        if self._sort_key is None:
+            self._sort_key = self.path.casefold()
+
+        return self._sort_key
     
     def startswith(self, other: Path | str) -> bool:
         return self.path.startswith(str(other))
@@ -91,16 +124,22 @@ class Path:
     
     @property
     def path(self) -> str:
-        if self._path == '':
-            return self.exact_path
-        return resource_path(self._path)
+        if self._resolved is None:
+            self._resolved = (
+                self.exact_path if self._path == ''
+                else resource_path(self._path)
+            )
+        return self._resolved
     
     @path.setter
     def path(self, value: str | list[str]) -> None:
         if isinstance(value, list):
             value = self._separator.join(value)
         
-        self._path = value
+        self._path = sys.intern(value)
+        self._resolved = None
+        self._parts = None
+        self._sort_key = None
     
     @property
     def exact_path(self) -> str:
@@ -152,22 +191,22 @@ class Path:
         return Path([other_path, self.path])
     
     def __contains__(self, item: str) -> bool:
-        return item in self.as_list()
+        return item in self.parts
     
     def __len__(self) -> int:
-        return len(self.as_list())
+        return len(self.parts)
         
     def __lt__(self, other: Path) -> bool:
-        return self.path.lower() < other.path.lower()
+        return self.sort_key < other.sort_key
     
     def __gt__(self, other: Path) -> bool:
-        return self.path.lower() > other.path.lower()
+        return self.sort_key > other.sort_key
     
     def __lte__(self, other: Path) -> bool:
-        return self.path.lower() <= other.path.lower()
+        return self.sort_key <= other.sort_key
     
     def __gte__(self, other: Path) -> bool:
-        return self.path.lower() >= other.path.lower()
+        return self.sort_key >= other.sort_key
 
     def __fspath__(self) -> str:
         return str(self.path)
@@ -239,6 +278,232 @@ def get_folders(directory: Path) -> list[Path]:
     return folders
 
 
+class Entry:
+    """
+    A lightweight stat record for a single directory entry.
+
+    The field names mirror `os.stat_result`, so an `Entry` can be passed
+    anywhere a stat result is expected (e.g. `_get_unix_owner`).
+    """
+    __slots__ = (
+        "name",
+        "is_dir",
+        "st_mode",
+        "st_size",
+        "st_mtime",
+        "st_uid",
+        "st_ino",
+        "st_dev",
+        "st_nlink",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        is_dir: bool,
+        st_mode: int = 0,
+        st_size: int = 0,
+        st_mtime: float = 0.0,
+        st_uid: int = 0,
+        st_ino: int = 0,
+        st_dev: int = 0,
+        st_nlink: int = 1
+    ) -> None:
+        self.name: str = name
+        self.is_dir: bool = is_dir
+        self.st_mode: int = st_mode
+        self.st_size: int = st_size
+        self.st_mtime: float = st_mtime
+        self.st_uid: int = st_uid
+        self.st_ino: int = st_ino
+        self.st_dev: int = st_dev
+        self.st_nlink: int = st_nlink
+
+    @classmethod
+    def from_dir_entry(
+        cls,
+        dir_entry: os.DirEntry[str],
+        with_stats: bool = True
+    ) -> Entry:
+        """
+        Builds an entry from an `os.scandir` result.
+
+        The file type comes from the cached `d_type`, so no extra
+        syscall is needed for it. When `with_stats` is set, the
+        `DirEntry`'s own stat cache is used (free on Windows, a single
+        `stat` on Unix), falling back to `lstat` for broken symlinks.
+        """
+        try:
+            is_dir: bool = not dir_entry.is_file()
+        except OSError:
+            is_dir = True
+
+        if not with_stats:
+            return cls(dir_entry.name, is_dir)
+
+        try:
+            stats: os.stat_result = dir_entry.stat()
+        except OSError:
+            try:
+                stats = dir_entry.stat(follow_symlinks=False)
+            except OSError:
+                return cls(dir_entry.name, is_dir)
+
+        return cls(
+            dir_entry.name,
+            is_dir,
+            stats.st_mode,
+            stats.st_size,
+            stats.st_mtime,
+            stats.st_uid,
+            stats.st_ino,
+            stats.st_dev,
+            stats.st_nlink
+        )
+
+    def __repr__(self) -> str:
+        kind: str = "folder" if self.is_dir else "file"
+        return f"Entry({self.name!r}, {kind}, {self.st_size})"
+
+
+def stat_entry(directory: Path, name: str) -> Entry | None:
+    """
+    Builds an `Entry` for a single item, for when it was not part of a
+    directory scan. Returns `None` if the item no longer exists.
+    """
+    path: str = os.path.join(directory.exact_path, name)
+    try:
+        stats: os.stat_result = os.stat(path)
+    except OSError:
+        try:
+            stats = os.lstat(path)
+        except OSError:
+            return None
+
+    return Entry(
+        name,
+        not os.path.isfile(path),
+        stats.st_mode,
+        stats.st_size,
+        stats.st_mtime,
+        stats.st_uid,
+        stats.st_ino,
+        stats.st_dev,
+        stats.st_nlink
+    )
+
+
+class ScanResult:
+    """The files, folders and stat records of a single directory scan."""
+    __slots__ = ("directory", "files", "folders", "entries", "st_mtime_ns")
+
+    def __init__(self, directory: Path) -> None:
+        self.directory: Path = directory
+        self.files: list[Path] = []
+        self.folders: list[Path] = []
+        self.entries: dict[str, Entry] = {}
+        self.st_mtime_ns: int | None = None
+
+    def add(self, entry: Entry) -> None:
+        self.entries[entry.name] = entry
+
+        if entry.is_dir:
+            self.folders.append(Path(entry.name))
+            return
+
+        self.files.append(Path(entry.name))
+
+    def __len__(self) -> int:
+        return len(self.files) + len(self.folders)
+
+
+def directory_mtime(file_path: Path, use_exact: bool = True) -> int | None:
+    """
+    Returns the mtime of a directory in nanoseconds, or `None` if it
+    has no meaningful mtime (the drives list) or cannot be read.
+    """
+    path: str = file_path.exact_path if use_exact else file_path.path
+    if path == '':
+        return None
+
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def iter_scan_directory(
+    file_path: Path,
+    use_exact: bool = False,
+    with_stats: bool = True,
+    chunk_size: int = 500
+) -> Iterator[list[Entry]]:
+    """
+    Scans a directory with `os.scandir`, yielding entries in chunks.
+
+    This lets callers show a directory progressively, or stop part way
+    through a scan, without waiting for the whole listing.
+
+    Args:
+        file_path (Path): The directory to scan.
+        use_exact (bool): Whether to use the exact path rather than the
+            resolved resource path.
+        with_stats (bool): Whether to collect stat records for every
+            entry.
+        chunk_size (int): The most entries to yield at once.
+
+    Yields:
+        list[Entry]: The next chunk of entries, in directory order.
+    """
+    path: str = file_path.exact_path if use_exact else file_path.path
+
+    if path == '':
+        yield [Entry(drive.exact_path, True) for drive in get_drives()]
+        return
+
+    chunk: list[Entry] = []
+    with os.scandir(path) as iterator:
+        for dir_entry in iterator:
+            chunk.append(Entry.from_dir_entry(dir_entry, with_stats))
+
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+
+    if chunk:
+        yield chunk
+
+
+@profiling.profiled("directory scan")
+def scan_directory(
+    file_path: Path,
+    use_exact: bool = False,
+    with_stats: bool = True
+) -> ScanResult:
+    """
+    Scans a directory in a single pass using `os.scandir`.
+
+    Args:
+        file_path (Path): The directory to scan.
+        use_exact (bool): Whether to use the exact path rather than the
+            resolved resource path.
+        with_stats (bool): Whether to collect stat records for every
+            entry. Turn this off when only the names are needed.
+
+    Returns:
+        ScanResult: The (unsorted) files and folders in the directory,
+            along with an `Entry` for each one keyed by its name.
+    """
+    result: ScanResult = ScanResult(file_path)
+    result.st_mtime_ns = directory_mtime(file_path, use_exact)
+
+    for chunk in iter_scan_directory(file_path, use_exact, with_stats):
+        for entry in chunk:
+            result.add(entry)
+
+    return result
+
+
 def get_files_folders(file_path: Path, use_exact: bool = False) -> tuple[list[Path], list[Path]]:
     """
     Gets all the files and folders in a given directory.
@@ -259,35 +524,50 @@ def get_files_folders(file_path: Path, use_exact: bool = False) -> tuple[list[Pa
             + f"{repr(file_path)} is not a directory."
         )
 
+    result: ScanResult = scan_directory(file_path, use_exact, with_stats=False)
 
-    items: tuple[Path, ...] = file_path.list_items(use_exact)
-
-    files: list[Path] = []
-    folders: list[Path] = []
-
-    for item in items:
-        full_path: Path = file_path + item
-        if os.path.isfile(full_path):
-            files.append(item)
-            continue
-            
-        folders.append(item)
-
-    return (sorted(files), sorted(folders))
+    return (
+        sorted(result.files, key=lambda x: x.sort_key),
+        sorted(result.folders, key=lambda x: x.sort_key)
+    )
 
 
-def get_file_metadata(file_path: Path) -> dict[str, Union[Path, str, datetime, None]]:
+@profiling.profiled("metadata fetch")
+def get_file_metadata(
+    file_path: Path,
+    entry: Entry | None = None
+) -> dict[str, Union[Path, str, datetime, None]]:
     """
     Retrieve metadata for a single file or folder.
 
     Args:
         file_path (str): Path to the file or folder.
+        entry (Entry | None): A stat record from `scan_directory`. When
+            given, the file is not stat-ed again.
 
     Returns:
         dict: Metadata dictionary containing owner, last modified time, and file size.
     """
+    with errors.timed("get_file_metadata", cached_stats=entry is not None) as event:
+        metadata: dict[str, Union[Path, str, datetime, None]] = _get_file_metadata(
+            file_path,
+            entry
+        )
+        event["ok"] = "Error" not in metadata
+        return metadata
+
+
+def _get_file_metadata(
+    file_path: Path,
+    entry: Entry | None
+) -> dict[str, Union[Path, str, datetime, None]]:
     try:
-        file_stats: os.stat_result = os.stat(file_path)
+        file_stats: os.stat_result | Entry = (
+            entry if entry and entry.st_mode else os.stat(file_path)
+        )
+        is_dir: bool = (
+            entry.is_dir if entry is not None else os.path.isdir(file_path)
+        )
         owner: str = (
             _get_windows_owner(file_path) 
             if platform() == "windows" 
@@ -302,7 +582,7 @@ def get_file_metadata(file_path: Path) -> dict[str, Union[Path, str, datetime, N
             "Last Modified": datetime.fromtimestamp(file_stats.st_mtime),
             "File Size": (
                 format_size(file_stats.st_size) 
-                if not os.path.isdir(file_path) 
+                if not is_dir 
                 else None
             ),
             "Item": get_file_type(file_path),
@@ -367,37 +647,97 @@ def fix_path(path: Path) -> Path:
     return path
 
 
+class OwnerCache:
+    """
+    Caches owner names by UID on Unix, or by SID string on Windows.
+
+    Resolving an owner can mean a round trip to a directory server, and
+    a listing is usually owned by a handful of accounts, so names are
+    kept for `ttl` seconds. Owners that could not be resolved are cached
+    too, for `negative_ttl` seconds, so a missing account is not looked
+    up again for every file it owns.
+    """
+    UNKNOWN: str = "Unknown Owner"
+
+    def __init__(self, ttl: float = 600.0, negative_ttl: float = 60.0) -> None:
+        self.ttl: float = ttl
+        self.negative_ttl: float = negative_ttl
+        self._names: dict[int | str, tuple[float, str]] = {}
+        self._lock: threading.Lock = threading.Lock()
+
+    def unix_name(self, uid: int) -> str:
+        cached: str | None = self._get(uid)
+        if cached is not None:
+            return cached
+
+        try:
+            name: str = pwd.getpwuid(uid).pw_name #type: ignore
+        except KeyError:
+            return self._put(uid, self.UNKNOWN, self.negative_ttl)
+
+        return self._put(uid, name, self.ttl)
+
+    def windows_name(self, owner_sid: Any) -> str:
+        key: str = win32security.ConvertSidToStringSid(owner_sid) #type: ignore
+        cached: str | None = self._get(key)
+        if cached is not None:
+            return cached
+
+        try:
+            name: str
+            name, _, _ = win32security.LookupAccountSid( #type: ignore
+                None, #type: ignore
+                owner_sid
+            )
+        except Exception as e:
+            errors.warn(None, "Owner lookup failed", f"{key}: {e}")
+            return self._put(key, self.UNKNOWN, self.negative_ttl)
+
+        return self._put(key, name, self.ttl)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._names.clear()
+
+    def _get(self, key: int | str) -> str | None:
+        with self._lock:
+            cached: tuple[float, str] | None = self._names.get(key)
+
+        if cached is None or cached[0] < time.monotonic():
+            return None
+
+        return cached[1]
+
+    def _put(self, key: int | str, name: str, ttl: float) -> str:
+        with self._lock:
+            self._names[key] = (time.monotonic() + ttl, name)
+
+        return name
+
+
+owner_cache: OwnerCache = OwnerCache()
+
+
 def _get_windows_owner(file_path: Path) -> str:
     """Get the owner of a file or folder on Windows."""
     try:
-        owner_sid: Any
-        owner: str
-        _: Any
-        
         security_descriptor: Any = (
             win32security.GetFileSecurity( #type: ignore
                 str(file_path),
                 win32security.OWNER_SECURITY_INFORMATION #type: ignore
             )
         )
-        owner_sid = security_descriptor.GetSecurityDescriptorOwner()
+        owner_sid: Any = security_descriptor.GetSecurityDescriptorOwner()
 
-        owner, _,  _ =   win32security.LookupAccountSid( #type: ignore
-            None, #type: ignore
-            owner_sid
-        )  
-        return owner
+        return owner_cache.windows_name(owner_sid)
     except Exception as e:
         print(e)
-        return "Unknown Owner"
+        return OwnerCache.UNKNOWN
     
 
-def _get_unix_owner(file_stats: os.stat_result) -> str:
+def _get_unix_owner(file_stats: os.stat_result | Entry) -> str:
         """Get the owner of a file or folder on Unix-like systems."""
-        try:
-            return pwd.getpwuid(file_stats.st_uid).pw_name #type: ignore
-        except KeyError:
-            return "Unknown Owner"
+        return owner_cache.unix_name(file_stats.st_uid)
 
 
 def resource_path(relative_path: str) -> str:
@@ -0,0 +1,271 @@
+from __future__ import annotations
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+import os
+import threading
+import time
+from typing import Any, Callable
+
+import errors
+from files import Path
+import gui
+
+
+class _WalkState:
+    """The running totals shared by every worker of one calculation."""
+    __slots__ = ("lock", "total", "files", "errors", "inodes", "mtimes")
+
+    def __init__(self) -> None:
+        self.lock: threading.Lock = threading.Lock()
+        self.total: int = 0
+        self.files: int = 0
+        self.errors: int = 0
+        self.inodes: set[tuple[int, int]] = set()
+        self.mtimes: dict[str, int | None] = {}
+
+
+class FolderSizeCalculator:
+    """
+    Works out the total size of a folder and everything inside it.
+
+    Each directory is listed with `os.scandir` as its own task on a
+    shared thread pool, so wide trees are walked in parallel. Symlinks
+    are not followed, and a file with several hardlinks is only counted
+    once. Partial totals are handed to the Tk thread through
+    `App.call_soon` while the walk runs. A finished total is cached
+    with the mtime of every directory the walk listed, and reused only
+    while none of them has changed, so a file added deep inside the
+    folder is not missed. Checking those mtimes is much cheaper than
+    listing the tree again. Starting a new calculation cancels the
+    previous one.
+    """
+    def __init__(
+        self,
+        app: gui.App,
+        max_workers: int | None = None,
+        max_cached: int = 256,
+        progress_interval: float = 0.1
+    ) -> None:
+        self._app: gui.App = app
+        self._pool: ThreadPoolExecutor = ThreadPoolExecutor(
+            max_workers=max_workers or min(8, (os.cpu_count() or 1) * 2),
+            thread_name_prefix="folder-size"
+        )
+        self._max_cached: int = max_cached
+        self._progress_interval: float = progress_interval
+        self._cache: OrderedDict[Path, tuple[dict[str, int | None], int]] = OrderedDict()
+        self._lock: threading.Lock = threading.Lock()
+        self._cancel_event: threading.Event | None = None
+
+    def calculate(
+        self,
+        directory: Path,
+        on_progress: Callable[[int, bool], Any]
+    ) -> None:
+        """
+        Starts calculating the size of `directory`.
+
+        Args:
+            directory (Path): The folder to measure.
+            on_progress (Callable[[int, bool], Any]): Called on the Tk
+                thread with the total so far, in bytes, and whether the
+                walk has finished. A cached total that is still valid is
+                delivered as finished, without a walk.
+        """
+        self.cancel()
+
+        cancel_event: threading.Event = threading.Event()
+        self._cancel_event = cancel_event
+
+        threading.Thread(
+            target=self._coordinate,
+            args=(directory, cancel_event, on_progress),
+            daemon=True
+        ).start()
+
+    def cached(self, directory: Path) -> int | None:
+        """
+        Returns the cached size of `directory`, if it is still valid.
+
+        This stats every directory under `directory`, so it is called
+        from the coordinating thread rather than the Tk thread.
+        """
+        with self._lock:
+            known: tuple[dict[str, int | None], int] | None = self._cache.get(directory)
+
+        if known is None:
+            return None
+
+        for path, mtime in known[0].items():
+            if _directory_mtime(path) != mtime:
+                self.invalidate(directory)
+                return None
+
+        with self._lock:
+            if directory in self._cache:
+                self._cache.move_to_end(directory)
+
+        return known[1]
+
+    def invalidate(self, directory: Path) -> None:
+        with self._lock:
+            self._cache.pop(directory, None)
+
+    def cancel(self) -> None:
+        if self._cancel_event is not None:
+            self._cancel_event.set()
+            self._cancel_event = None
+
+    def stop(self) -> None:
+        self.cancel()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def _coordinate(
+        self,
+        directory: Path,
+        cancel_event: threading.Event,
+        on_progress: Callable[[int, bool], Any]
+    ) -> None:
+        cached: int | None = self.cached(directory)
+        if cached is not None:
+            self._app.call_soon(self._deliver, cancel_event, on_progress, cached, True)
+            return
+
+        started: float = time.perf_counter()
+        state: _WalkState = _WalkState()
+        pending: set[Future[list[str]]] = {
+            self._pool.submit(self._walk, directory.exact_path, state, cancel_event)
+        }
+        last_report: float = started
+
+        while pending:
+            done, pending = wait(
+                pending,
+                timeout=self._progress_interval,
+                return_when=FIRST_COMPLETED
+            )
+            if cancel_event.is_set():
+                for future in pending:
+                    future.cancel()
+                return
+
+            for future in done:
+                for subdirectory in future.result():
+                    pending.add(self._pool.submit(
+                        self._walk,
+                        subdirectory,
+                        state,
+                        cancel_event
+                    ))
+
+            if time.perf_counter() - last_report >= self._progress_interval:
+                last_report = time.perf_counter()
+                self._app.call_soon(
+                    self._deliver,
+                    cancel_event,
+                    on_progress,
+                    state.total,
+                    False
+                )
+
+        with self._lock:
+            self._cache[directory] = (state.mtimes, state.total)
+            self._cache.move_to_end(directory)
+            while len(self._cache) > self._max_cached:
+                self._cache.popitem(last=False)
+
+        errors.info(
+            None,
+            "Folder size",
+            "%r: %d files, %d bytes, %d unreadable, in %.2fs",
+            directory,
+            state.files,
+            state.total,
+            state.errors,
+            time.perf_counter() - started
+        )
+        self._app.call_soon(
+            self._deliver,
+            cancel_event,
+            on_progress,
+            state.total,
+            True
+        )
+
+    def _walk(
+        self,
+        directory: str,
+        state: _WalkState,
+        cancel_event: threading.Event
+    ) -> list[str]:
+        if cancel_event.is_set():
+            return []
+
+        # Taken before listing, so a change made during the walk leaves
+        # the cached total stale rather than looking up to date.
+        mtime: int | None = _directory_mtime(directory)
+        subdirectories: list[str] = []
+        total: int = 0
+        count: int = 0
+        linked: list[tuple[tuple[int, int], int]] = []
+
+        try:
+            with os.scandir(directory) as iterator:
+                for entry in iterator:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            subdirectories.append(entry.path)
+                            continue
+
+                        stats: os.stat_result = entry.stat(follow_symlinks=False)
+                    except OSError:
+                        with state.lock:
+                            state.errors += 1
+                        continue
+
+                    count += 1
+                    if stats.st_nlink > 1 and stats.st_ino:
+                        linked.append(((stats.st_dev, stats.st_ino), stats.st_size))
+                        continue
+
+                    total += stats.st_size
+        except OSError:
+            with state.lock:
+                state.errors += 1
+                state.mtimes[directory] = mtime
+            return []
+
+        with state.lock:
+            state.mtimes[directory] = mtime
+            for inode, size in linked:
+                if inode in state.inodes:
+                    continue
+
+                state.inodes.add(inode)
+                total += size
+
+            state.total += total
+            state.files += count
+
+        return subdirectories
+
+    def _deliver(
+        self,
+        cancel_event: threading.Event,
+        callback: Callable[..., Any],
+        *args: Any
+    ) -> None:
+        if cancel_event.is_set():
+            return
+
+        if args[-1] and self._cancel_event is cancel_event:
+            self._cancel_event = None
+
+        callback(*args)
+
+
+def _directory_mtime(directory: str) -> int | None:
+    try:
+        return os.stat(directory).st_mtime_ns
+    except OSError:
+        return None
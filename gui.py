@@ -1,7 +1,9 @@
 from __future__ import annotations
 from logging import root
 import os
+import queue
 import sys
+import time
 import tkinter as tk
 from typing import Any, Callable
 from PIL import Image
@@ -12,6 +14,7 @@ import customtkinter as ctk #type: ignore
 import errors
 from files import Path
 import files
+import profiling
 import utils
 
 
@@ -270,6 +273,319 @@ class Button(ctk.CTkButton):
 
 
 
+class ListItem:
+    """
+    A single row of data shown by a `VirtualList`.
+
+    `directory` is only set for rows that are not in the current
+    directory, such as search results, whose `text` is then a full path.
+    """
+    __slots__ = ("text", "note", "entry", "directory")
+
+    def __init__(
+        self,
+        text: str,
+        note: str = "",
+        entry: files.Entry | None = None,
+        directory: Path | None = None
+    ) -> None:
+        self.text: str = text
+        self.note: str = note
+        self.entry: files.Entry | None = entry
+        self.directory: Path | None = directory
+
+    def __repr__(self) -> str:
+        return f"ListItem({self.text!r}, {self.note!r})"
+
+
+
+class VirtualList(Frame):
+    """
+    A scrollable list that only builds widgets for the rows on screen.
+
+    A small pool of `Button` rows is created to fill the viewport, and
+    scrolling rebinds those rows to different `ListItem`s rather than
+    creating new widgets, so the cost of showing a list depends on the
+    height of the viewport rather than the number of items.
+
+    `images` maps a `ListItem.note` to the image shown beside it. Rows
+    always keep some text and image, because CTkButton only attaches
+    bindings to labels that exist when the button is bound.
+
+    `on_view_change`, if given, is called with the new `visible_range`
+    whenever the rows on screen are bound to different items.
+    """
+    def __init__(
+        self,
+        widget_name: str,
+        master: ctk.CTk | ctk.CTkBaseClass,
+        single_click: Callable[[ListItem, tk.Event[Any]], None],
+        double_click: Callable[[ListItem, tk.Event[Any]], None] | None = None,
+        images: dict[str, ctk.CTkImage] | None = None,
+        row_height: int = 30,
+        scroll_step: int = 3,
+        on_view_change: Callable[[int, int], None] | None = None,
+        **kwargs: Any
+    ) -> None:
+        kwargs.setdefault("fg_color", "transparent")
+        super().__init__(widget_name, master, **kwargs) #type: ignore
+
+        self._single_click_callback: Callable[[ListItem, tk.Event[Any]], None] = (
+            single_click
+        )
+        self._double_click_callback: Callable[[ListItem, tk.Event[Any]], None] | None = (
+            double_click
+        )
+        self._images: dict[str, ctk.CTkImage] = images or {}
+        self._default_image: ctk.CTkImage | None = next(
+            iter(self._images.values()),
+            None
+        )
+        self._row_height: int = row_height
+        self._scroll_step: int = scroll_step
+        self._on_view_change: Callable[[int, int], None] | None = on_view_change
+
+        self._items: list[ListItem] = []
+        self._rows: list[Button] = []
+        self._row_items: dict[Button, ListItem | None] = {}
+        self._first: int = 0
+        self._visible_rows: int = 1
+        self._selected: ListItem | None = None
+
+        self._scrollbar: ctk.CTkScrollbar = ctk.CTkScrollbar(
+            self,
+            command=self._on_scrollbar
+        )
+        self._scrollbar.pack(side=ctk.RIGHT, fill=ctk.Y)
+
+        self._viewport: ctk.CTkFrame = ctk.CTkFrame(self, fg_color="transparent")
+        self._viewport.pack(side=ctk.LEFT, fill=ctk.BOTH, expand=True)
+        self._viewport.bind("<Configure>", self._on_resize)
+
+        if utils.platform() == "linux":
+            self._viewport.bind("<Button-4>", self._on_linux_scroll)
+            self._viewport.bind("<Button-5>", self._on_linux_scroll)
+        else:
+            self._viewport.bind("<MouseWheel>", self._on_mousewheel)
+
+    def set_items(self, items: list[ListItem]) -> None:
+        """Replaces every item in the list, keeping the selection if possible."""
+        self._items = items
+        if self._selected is not None and self._selected not in items:
+            self._selected = None
+
+        self._first = self._clamp_first(self._first)
+        self._render()
+
+    def clear(self) -> None:
+        self._selected = None
+        self._first = 0
+        self.set_items([])
+
+    def append_items(self, items: list[ListItem]) -> None:
+        """Adds `items` to the end of the list without resetting it."""
+        self._items.extend(items)
+        self._render()
+
+    def insert_item(self, index: int, item: ListItem) -> None:
+        """Inserts `item` before the item at `index`, keeping the view still."""
+        self._items.insert(index, item)
+        if index < self._first:
+            self._first += 1
+
+        self._render()
+
+    def remove_item(self, item: ListItem) -> None:
+        try:
+            index: int = self._items.index(item)
+        except ValueError:
+            return
+
+        del self._items[index]
+        if index < self._first:
+            self._first -= 1
+
+        if item is self._selected:
+            self._selected = None
+
+        self._first = self._clamp_first(self._first)
+        self._render()
+
+    def select(self, item: ListItem | None) -> None:
+        """Highlights `item`, wherever it is in the list."""
+        self._selected = item
+        self._render()
+
+    def scroll_to_top(self) -> None:
+        self.scroll_to(0)
+
+    def scroll_to(self, index: int) -> None:
+        """Scrolls so that the item at `index` is the first visible row."""
+        self._first = self._clamp_first(index)
+        self._render()
+
+    def see(self, item: ListItem) -> None:
+        """Scrolls the minimum amount needed to bring `item` on screen."""
+        try:
+            index: int = self._items.index(item)
+        except ValueError:
+            return
+
+        if index < self._first:
+            self.scroll_to(index)
+        elif index >= self._first + self._visible_rows:
+            self.scroll_to(index - self._visible_rows + 1)
+
+    def row_for(self, item: ListItem) -> Button | None:
+        """Returns the row currently displaying `item`, if it is on screen."""
+        for row, row_item in self._row_items.items():
+            if row_item is item:
+                return row
+
+        return None
+
+    def _clamp_first(self, first: int) -> int:
+        highest_first: int = max(0, len(self._items) - self._visible_rows)
+        return max(0, min(first, highest_first))
+
+    def _on_resize(self, event: tk.Event[Any]) -> None:
+        visible_rows: int = max(1, event.height // self._row_height)
+        if visible_rows == self._visible_rows and self._rows:
+            return
+
+        self._visible_rows = visible_rows
+        self._resize_pool(visible_rows + 1)
+        self._first = self._clamp_first(self._first)
+        self._render()
+
+    @profiling.profiled("widget build")
+    def _resize_pool(self, size: int) -> None:
+        while len(self._rows) < size:
+            row: Button = Button(
+                "row",
+                self._viewport,
+                single_click=self._row_single_click,
+                double_click=self._row_double_click,
+                bind_parent_scroll=True,
+                scroll_parent=self, #type: ignore
+                text=" ",
+                image=self._default_image,
+                height=self._row_height - 2,
+                border_width=1,
+                border_color="gray",
+                compound=ctk.LEFT,
+                anchor="w"
+            )
+            self._rows.append(row)
+            self._row_items[row] = None
+
+        while len(self._rows) > size:
+            row = self._rows.pop()
+            del self._row_items[row]
+            row.destroy()
+
+    @profiling.profiled("list render")
+    def _render(self) -> None:
+        changed: bool = False
+
+        for position, row in enumerate(self._rows):
+            index: int = self._first + position
+
+            if index >= len(self._items):
+                if self._row_items[row] is not None:
+                    row.place_forget()
+                    self._row_items[row] = None
+                continue
+
+            item: ListItem = self._items[index]
+            border_color: str = (
+                row.cget("hover_color") #type: ignore
+                if item is self._selected
+                else "gray"
+            )
+
+            if self._row_items[row] is not item:
+                row.note = item.note
+                row.configure( #type: ignore
+                    text=item.text or " ",
+                    image=self._images.get(item.note, self._default_image)
+                )
+                if self._row_items[row] is None:
+                    row.place(x=0, y=position * self._row_height, relwidth=1)
+                self._row_items[row] = item
+                changed = True
+
+            if row.cget("border_color") != border_color: #type: ignore
+                row.configure(border_color=border_color) #type: ignore
+
+        self._update_scrollbar()
+
+        if changed and self._on_view_change is not None:
+            self._on_view_change(*self.visible_range)
+
+    def _update_scrollbar(self) -> None:
+        if not self._items:
+            self._scrollbar.set(0, 1)
+            return
+
+        total: int = len(self._items)
+        self._scrollbar.set(
+            self._first / total,
+            min(1, (self._first + self._visible_rows) / total)
+        )
+
+    def _on_scrollbar(self, action: str, value: str | float, unit: str = "") -> None:
+        if action == "moveto":
+            self.scroll_to(round(float(value) * len(self._items)))
+            return
+
+        step: int = self._visible_rows if unit == "pages" else self._scroll_step
+        self.scroll_to(self._first + int(value) * step)
+
+    def _row_single_click(self, row: Button, event: tk.Event[Any]) -> None:
+        item: ListItem | None = self._row_items.get(row)
+        if item is not None:
+            self._single_click_callback(item, event)
+
+    def _row_double_click(self, row: Button, event: tk.Event[Any]) -> None:
+        item: ListItem | None = self._row_items.get(row)
+        if item is None:
+            return
+
+        if self._double_click_callback is None:
+            self._single_click_callback(item, event)
+            return
+
+        self._double_click_callback(item, event)
+
+    def _on_mousewheel(self, event: tk.Event[Any]) -> None:
+        notches: int = int(-1 * (event.delta / 120))
+        self.scroll_to(self._first + notches * self._scroll_step)
+
+    def _on_linux_scroll(self, event: tk.Event[Any]) -> None:
+        if event.num == 4:
+            self.scroll_to(self._first - self._scroll_step)
+        elif event.num == 5:
+            self.scroll_to(self._first + self._scroll_step)
+
+    @property
+    def items(self) -> list[ListItem]:
+        return self._items
+
+    @property
+    def selected(self) -> ListItem | None:
+        return self._selected
+
+    @property
+    def visible_range(self) -> tuple[int, int]:
+        """The (start, stop) indices of the items currently on screen."""
+        return (
+            self._first,
+            min(len(self._items), self._first + self._visible_rows + 1)
+        )
+
+
+
 class App:
     def __init__(
         self,
@@ -302,6 +618,14 @@ class App:
 
         self.extra_details: dict[str, Any] = {}
 
+        self._calls: queue.SimpleQueue[
+            tuple[Callable[..., Any], tuple[Any, ...]]
+        ] = queue.SimpleQueue()
+        self._call_interval: int = 15
+        self._call_budget: float = 0.03
+        self.root.after(self._call_interval, self._drain_calls)
+        self._exit_callbacks: list[Callable[[], Any]] = []
+
         self.root.bind("<F11>", lambda event: self.toggle_fullscreen())
         self.root.bind("<Escape>", lambda event: self._exit_fullscreen())
         self.root.bind("<Alt-F4>", lambda event: self._exit)
@@ -311,6 +635,45 @@ class App:
         """Runs the app mainloop."""
         self.root.mainloop() #type: ignore
 
+    def call_soon(self, callback: Callable[..., Any], *args: Any) -> None:
+        """
+        Schedules `callback(*args)` to run on the Tk thread.
+
+        This is safe to call from any thread, and is the only way
+        background workers should hand results back to the widgets.
+        """
+        self._calls.put((callback, args))
+
+    def on_exit(self, callback: Callable[[], Any]) -> None:
+        """
+        Registers `callback` to run as the app closes, before the window
+        is destroyed. Callbacks should return quickly, and hand any long
+        work to another process.
+        """
+        self._exit_callbacks.append(callback)
+
+    def _drain_calls(self) -> None:
+        deadline: float = time.perf_counter() + self._call_budget
+
+        try:
+            while time.perf_counter() < deadline:
+                try:
+                    callback, args = self._calls.get_nowait()
+                except queue.Empty:
+                    break
+
+                try:
+                    callback(*args)
+                except Exception as e:
+                    errors.warn(
+                        None,
+                        "Background callback failed",
+                        f"{getattr(callback, '__qualname__', callback)}: "
+                        + f"{type(e).__name__}: {e}"
+                    )
+        finally:
+            self.root.after(self._call_interval, self._drain_calls)
+
     def add_frame(
         self,
         frame: Frame | ScrollableFrame
@@ -370,6 +733,7 @@ class App:
         self._widgets.remove(widget)
         widget.destroy()
 
+    @profiling.profiled("image load")
     def add_image(
         self,
         name: str,
@@ -389,6 +753,12 @@ class App:
         self._images[name] = ctk.CTkImage(light_image, dark_image, size) #type: ignore
 
     def _exit(self) -> None:
+        for callback in self._exit_callbacks:
+            try:
+                callback()
+            except Exception as e:
+                errors.warn(None, "Exit callback failed", f"{callback}: {e}")
+
         self.root.destroy()
         self.root.quit()
         sys.exit(1)
@@ -434,7 +804,7 @@ class App:
                 self,
                 "Not a directory error",
                 "There was a problem changing the apps file path.",
-                f"file_path expects a directory! {value} does not match!"
+                log_message=f"file_path expects a directory! {value} does not match!"
             )
 
         self._file_path = files.fix_path(value)
@@ -455,7 +825,7 @@ class App:
                 self,
                 "Not a directory error",
                 "There was a problem changing the apps file path.",
-                f"prev_file_path expects a directory! {value} does not match!"
+                log_message=f"prev_file_path expects a directory! {value} does not match!"
             )
 
         self._prev_file_path = files.fix_path(value)
@@ -531,7 +901,7 @@ class App:
                 self.root,
                 "Not a directory",
                 "There was a problem setting the app's root directory.",
-                f"root_dir expects a directory! {repr(value)} does not match!"
+                log_message=f"root_dir expects a directory! {repr(value)} does not match!"
             )
 
         self._root_dir = files.fix_path(value)
@@ -548,7 +918,7 @@ class App:
                 self.root,
                 "Attribute error",
                 "There was a problem obtaining an app value.",
-                f"Attribute {name} of class {self.__class__.__name__} "
+                log_message=f"Attribute {name} of class {self.__class__.__name__} "
                 + "does not exist."
             )
 
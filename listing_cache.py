@@ -0,0 +1,230 @@
+from __future__ import annotations
+import bisect
+from collections import OrderedDict
+import sys
+import threading
+
+import files
+from files import Path
+import sorting
+
+
+class CachedListing:
+    """A directory listing in natural name order, as stored by `ListingCache`."""
+    __slots__ = ("directory", "folders", "files", "entries", "st_mtime_ns", "size")
+
+    def __init__(
+        self,
+        directory: Path,
+        folders: list[Path],
+        files_list: list[Path],
+        entries: dict[str, files.Entry],
+        st_mtime_ns: int | None
+    ) -> None:
+        self.directory: Path = directory
+        self.folders: list[Path] = folders
+        self.files: list[Path] = files_list
+        self.entries: dict[str, files.Entry] = entries
+        self.st_mtime_ns: int | None = st_mtime_ns
+        self.size: int = _estimate_size(entries, len(folders) + len(files_list))
+
+    def __len__(self) -> int:
+        return len(self.folders) + len(self.files)
+
+
+class ListingCache:
+    """
+    A bounded LRU cache of directory listings.
+
+    Listings are evicted, least recently used first, once either the
+    total number of cached entries or their estimated memory use goes
+    over its limit. Every lookup checks the directory's mtime, so a
+    directory that has changed on disk is treated as a miss and gets
+    rescanned, without needing a manual refresh.
+    """
+    def __init__(
+        self,
+        max_entries: int = 500_000,
+        max_bytes: int = 256 * 1024 * 1024
+    ) -> None:
+        self.max_entries: int = max_entries
+        self.max_bytes: int = max_bytes
+
+        self._listings: OrderedDict[Path, CachedListing] = OrderedDict()
+        self._lock: threading.Lock = threading.Lock()
+        self._entries: int = 0
+        self._bytes: int = 0
+
+        self.hits: int = 0
+        self.misses: int = 0
+        self.stale: int = 0
+        self.evictions: int = 0
+
+    def get(self, directory: Path) -> CachedListing | None:
+        """
+        Returns the cached listing for `directory`, if it is still valid.
+
+        A listing whose directory mtime no longer matches is dropped
+        and counted as both stale and a miss.
+        """
+        with self._lock:
+            listing: CachedListing | None = self._listings.get(directory)
+
+            if listing is None:
+                self.misses += 1
+                return None
+
+            if (
+                listing.st_mtime_ns is not None
+                and files.directory_mtime(directory) != listing.st_mtime_ns
+            ):
+                self._remove(directory)
+                self.stale += 1
+                self.misses += 1
+                return None
+
+            self._listings.move_to_end(directory)
+            self.hits += 1
+            return listing
+
+    def peek(self, directory: Path) -> CachedListing | None:
+        """Returns the cached listing without validating it or counting it."""
+        with self._lock:
+            return self._listings.get(directory)
+
+    def put(self, scan: files.ScanResult) -> CachedListing:
+        """Sorts and caches a scan, evicting old listings as needed."""
+        listing: CachedListing = CachedListing(
+            scan.directory,
+            sorting.sort_paths(scan.folders),
+            sorting.sort_paths(scan.files),
+            scan.entries,
+            scan.st_mtime_ns
+        )
+
+        with self._lock:
+            self._remove(scan.directory)
+            self._listings[scan.directory] = listing
+            self._entries += len(listing)
+            self._bytes += listing.size
+            self._evict()
+
+        return listing
+
+    def invalidate(self, directory: Path) -> None:
+        with self._lock:
+            self._remove(directory)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._listings.clear()
+            self._entries = 0
+            self._bytes = 0
+
+    def remove_entry(self, directory: Path, name: str) -> None:
+        """Removes a single item from a cached listing, if it is cached."""
+        with self._lock:
+            listing: CachedListing | None = self._listings.get(directory)
+            if listing is None:
+                return
+
+            entry: files.Entry | None = listing.entries.pop(name, None)
+
+            for items in (listing.folders, listing.files):
+                try:
+                    items.remove(Path(name))
+                except ValueError:
+                    continue
+
+                self._entries -= 1
+                break
+
+            if entry is not None:
+                listing.size -= _ENTRY_SIZE + sys.getsizeof(name)
+                self._bytes -= _ENTRY_SIZE + sys.getsizeof(name)
+
+    def add_entry(self, directory: Path, entry: files.Entry) -> None:
+        """Adds or updates a single item in a cached listing, if it is cached."""
+        with self._lock:
+            listing: CachedListing | None = self._listings.get(directory)
+            if listing is None:
+                return
+
+            if entry.name in listing.entries:
+                listing.entries[entry.name] = entry
+                return
+
+            listing.entries[entry.name] = entry
+            bisect.insort(
+                listing.folders if entry.is_dir else listing.files,
+                Path(entry.name),
+                key=sorting.path_key
+            )
+            listing.size += _ENTRY_SIZE + sys.getsizeof(entry.name)
+            self._entries += 1
+            self._bytes += _ENTRY_SIZE + sys.getsizeof(entry.name)
+
+    def revalidate(self, directory: Path) -> None:
+        """
+        Marks a cached listing as matching the directory on disk.
+
+        Call this after applying every known change to the listing, so
+        the next lookup is a hit rather than a rescan.
+        """
+        with self._lock:
+            listing: CachedListing | None = self._listings.get(directory)
+            if listing is not None and listing.st_mtime_ns is not None:
+                listing.st_mtime_ns = files.directory_mtime(directory)
+
+    def stats(self) -> dict[str, int | float]:
+        """Counters for tuning the cache limits."""
+        with self._lock:
+            lookups: int = self.hits + self.misses
+            return {
+                "directories": len(self._listings),
+                "entries": self._entries,
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale": self.stale,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def _remove(self, directory: Path) -> None:
+        listing: CachedListing | None = self._listings.pop(directory, None)
+        if listing is None:
+            return
+
+        self._entries -= len(listing)
+        self._bytes -= listing.size
+
+    def _evict(self) -> None:
+        while (
+            len(self._listings) > 1
+            and (self._entries > self.max_entries or self._bytes > self.max_bytes)
+        ):
+            directory, _ = next(iter(self._listings.items()))
+            self._remove(directory)
+            self.evictions += 1
+
+    def __contains__(self, directory: Path) -> bool:
+        with self._lock:
+            return directory in self._listings
+
+    def __len__(self) -> int:
+        return len(self._listings)
+
+
+# Rough per-entry cost of an `Entry`, its `Path` and the dict/list slots
+# holding them. Measuring every object would cost more than it saves.
+_ENTRY_SIZE: int = (
+    sys.getsizeof(files.Entry("", False))
+    + sys.getsizeof(Path())
+    + 3 * 8
+)
+
+
+def _estimate_size(entries: dict[str, files.Entry], count: int) -> int:
+    names: int = sum(sys.getsizeof(name) for name in entries)
+    return names + count * _ENTRY_SIZE + sys.getsizeof(entries)
@@ -0,0 +1,184 @@
+from __future__ import annotations
+import threading
+import time
+from typing import Any, Callable
+
+import errors
+import files
+from files import Path
+import gui
+from metadata_index import MetadataIndex
+import profiling
+
+
+class DirectoryLoader:
+    """
+    Loads directory listings on a background thread.
+
+    Entries are handed back to the Tk thread in chunks through
+    `App.call_soon`, so a large or slow directory can be shown as it is
+    read. Starting a new load cancels the previous one, and any chunks
+    from a cancelled load that are still queued are dropped.
+
+    When a `MetadataIndex` is given, a directory whose mtime matches the
+    index is served from it without being scanned. An out of date index
+    listing is shown straight away as a preview, while the directory is
+    rescanned and the index updated in the background.
+    """
+    def __init__(
+        self,
+        app: gui.App,
+        chunk_size: int = 500,
+        index: MetadataIndex | None = None
+    ) -> None:
+        self._app: gui.App = app
+        self._chunk_size: int = chunk_size
+        self._index: MetadataIndex | None = index
+        self._cancel_event: threading.Event | None = None
+
+    def load(
+        self,
+        file_path: Path,
+        on_chunk: Callable[[list[files.Entry]], Any],
+        on_done: Callable[[files.ScanResult], Any],
+        on_error: Callable[[OSError], Any] | None = None,
+        on_preview: Callable[[files.ScanResult], Any] | None = None
+    ) -> None:
+        """
+        Starts loading `file_path`, cancelling any load in progress.
+
+        Args:
+            file_path (Path): The directory to load.
+            on_chunk (Callable[[list[files.Entry]], Any]): Called on the
+                Tk thread with each chunk of entries as it is read.
+            on_done (Callable[[files.ScanResult], Any]): Called on the
+                Tk thread with the full scan once it has finished.
+            on_error (Callable[[OSError], Any] | None): Called on the Tk
+                thread if the directory could not be read.
+            on_preview (Callable[[files.ScanResult], Any] | None):
+                Called on the Tk thread with an out of date listing from
+                the index, if there is one. No chunks are delivered
+                after a preview, only the final scan.
+        """
+        self.cancel()
+
+        cancel_event: threading.Event = threading.Event()
+        self._cancel_event = cancel_event
+
+        thread: threading.Thread = threading.Thread(
+            target=self._worker,
+            args=(
+                file_path,
+                cancel_event,
+                on_chunk,
+                on_done,
+                on_error,
+                on_preview
+            ),
+            daemon=True
+        )
+        thread.start()
+
+    def cancel(self) -> None:
+        """Cancels the current load, if there is one."""
+        if self._cancel_event is not None:
+            self._cancel_event.set()
+            self._cancel_event = None
+
+    @property
+    def loading(self) -> bool:
+        return self._cancel_event is not None
+
+    def _worker(
+        self,
+        file_path: Path,
+        cancel_event: threading.Event,
+        on_chunk: Callable[[list[files.Entry]], Any],
+        on_done: Callable[[files.ScanResult], Any],
+        on_error: Callable[[OSError], Any] | None,
+        on_preview: Callable[[files.ScanResult], Any] | None
+    ) -> None:
+        result: files.ScanResult = files.ScanResult(file_path)
+        result.st_mtime_ns = files.directory_mtime(file_path)
+
+        indexed: files.ScanResult | None = (
+            self._index.load(file_path) if self._index is not None else None
+        )
+        if indexed is not None and indexed.st_mtime_ns == result.st_mtime_ns:
+            self._app.call_soon(self._finish, cancel_event, on_done, indexed)
+            return
+
+        streaming: bool = True
+        if indexed is not None and on_preview is not None:
+            self._app.call_soon(self._deliver, cancel_event, on_preview, indexed)
+            streaming = False
+
+        started: float = time.perf_counter()
+        try:
+            for chunk in files.iter_scan_directory(
+                file_path,
+                use_exact=True,
+                chunk_size=self._chunk_size
+            ):
+                if cancel_event.is_set():
+                    return
+
+                for entry in chunk:
+                    result.add(entry)
+
+                if streaming:
+                    self._app.call_soon(
+                        self._deliver,
+                        cancel_event,
+                        on_chunk,
+                        chunk
+                    )
+
+        except OSError as e:
+            errors.warn(
+                None,
+                "Directory load failed",
+                f"{repr(file_path)} could not be read: {e}"
+            )
+            if on_error is not None:
+                self._app.call_soon(self._finish, cancel_event, on_error, e)
+            return
+
+        profiling.record("directory scan", time.perf_counter() - started)
+        errors.event(
+            "directory_scan",
+            time.perf_counter() - started,
+            entries=len(result),
+            preview=not streaming
+        )
+        self._app.call_soon(self._finish, cancel_event, on_done, result)
+
+        # Stored after the listing is handed over, so writing a large
+        # directory to the index does not hold up showing it.
+        if self._index is not None and not cancel_event.is_set():
+            self._index.store(result)
+
+    def _deliver(
+        self,
+        cancel_event: threading.Event,
+        callback: Callable[..., Any],
+        *args: Any
+    ) -> None:
+        if cancel_event.is_set():
+            return
+
+        callback(*args)
+
+    def _finish(
+        self,
+        cancel_event: threading.Event,
+        callback: Callable[..., Any],
+        *args: Any
+    ) -> None:
+        if cancel_event.is_set():
+            return
+
+        if self._cancel_event is cancel_event:
+            self._cancel_event = None
+
+        callback(*args)
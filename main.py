@@ -1,6 +1,7 @@
 from __future__ import annotations
 import argparse
 import asyncio
+import bisect
 import ctypes
 import json
 import os
@@ -8,6 +9,8 @@ import shutil
 from PIL import Image, ImageTk #type: ignore - This is needed on Linux, but not Win32
 import subprocess
 import threading
+import time
+import tkinter as tk
 from typing import Any, Callable
 import sys
 
@@ -15,12 +18,24 @@ import customtkinter as ctk #type: ignore
 import pyperclip
 from screeninfo import Monitor #type: ignore
 
+import content_sniff
 import errors
 import files
 from files import Path
+import folder_size
 import gui
+import listing_cache
+import loader
+import metadata_index
+import metadata_service
+import profiling
+import search
 import settings
+import sorter
+import sorting
+import transfer
 import utils
+import watcher
 
 
 
@@ -78,6 +93,21 @@ efficiency without compromising flexibility.
         help="Sets the y coordinate of the window",
         default=None
     )
+    parser.add_argument(
+        "--sort",
+        help="Sorts the global folders, then exits without opening the app",
+        action="store_true"
+    )
+    parser.add_argument(
+        "--dry-run",
+        help="With --sort, only logs what would be moved",
+        action="store_true"
+    )
+    parser.add_argument(
+        "--incremental",
+        help="With --sort, only sorts files changed since the last sort",
+        action="store_true"
+    )
     parser.add_argument(
         "-v",
         "--version",
@@ -120,44 +150,120 @@ def get_settings(file_path: Path) -> settings.Settings:
     
     with open(file_path, "r") as f:
         sett.parse_settings(json.load(f))
+
+    errors.set_log_level(sett.log_level)
     
     return sett
 
 
-def fetch_metadata(
+def display_details(item: gui.ListItem, app: gui.App) -> None:
+    file_path: str = item.text
+
+    app.main_section.files_list.select(item)
+    app.extra_details["selected"] = item
+
+    for widget in app.details_bar.widgets[:]:
+        app.details_bar.remove_widget(widget)
+    
+    file_path = _item_path(app, item).path
+    entry: files.Entry | None = item.entry
+    if entry is not None and item.directory is None:
+        # Cached listings are only checked against the folder's mtime,
+        # which editing a file in place does not change, so the clicked
+        # item is stat-ed again before its details are shown.
+        fresh: files.Entry | None = files.stat_entry(app.file_path, entry.name)
+        if fresh is not None and (fresh.st_mtime, fresh.st_size) != (
+            entry.st_mtime,
+            entry.st_size
+        ):
+            app.extra_details["metadata"].invalidate(Path(file_path))
+            app.extra_details["listing_cache"].add_entry(app.file_path, fresh)
+            item.entry = entry = fresh
+
+    app.extra_details["metadata"].fetch(
+        Path(file_path),
+        lambda metadata_dict: _update_details_bar(app, metadata_dict),
+        entry
+    )
+
+    folder_sizes: folder_size.FolderSizeCalculator = (
+        app.extra_details["folder_size"]
+    )
+    if item.note != "folder":
+        folder_sizes.cancel()
+        return
+
+    folder_sizes.calculate(
+        Path(file_path),
+        lambda total, finished: _show_folder_size(app, item, total, finished)
+    )
+
+
+def _schedule_prefetch(app: gui.App, start: int, stop: int) -> None:
+    """
+    Prefetches metadata for the rows on screen and a screen's worth
+    either side, once scrolling has settled for a moment.
+    """
+    pending_job: str | None = app.extra_details.get("prefetch_job")
+    if pending_job is not None:
+        app.root.after_cancel(pending_job)
+
+    app.extra_details["prefetch_job"] = app.root.after(
+        150,
+        lambda: _prefetch_rows(app, start, stop)
+    )
+
+
+def _prefetch_rows(app: gui.App, start: int, stop: int) -> None:
+    app.extra_details["prefetch_job"] = None
+    if app.extra_details["loader"].loading:
+        return
+
+    items: list[gui.ListItem] = app.main_section.files_list.items
+    margin: int = stop - start
+    visible: list[gui.ListItem] = items[start:stop]
+    neighbours: list[gui.ListItem] = (
+        items[stop:stop + margin] + items[max(0, start - margin):start]
+    )
+
+    app.extra_details["metadata"].prefetch([
+        (_item_path(app, item), item.entry) for item in visible + neighbours
+    ])
+
+
+def _show_folder_size(
     app: gui.App,
-    file_path: str,
-    callback: Callable[[gui.App, dict[str, str | Path | files.datetime | None]], Any]
+    item: gui.ListItem,
+    total: int,
+    finished: bool
 ) -> None:
-    def worker():
-        metadata_dict: dict[str, str | Path| files.datetime | None] = (
-            files.get_file_metadata(Path(file_path))
-        )
-        callback(app, metadata_dict)
+    if app.extra_details.get("selected") is not item:
+        return
 
-    thread = threading.Thread(target=worker)
-    thread.start()
+    text: str = f"  {files.format_size(total)}" + ("" if finished else "...")
+    size_label: ctk.CTkLabel | None = getattr(app.details_bar, "folder_size_val", None)
 
+    if size_label is not None and size_label in app.details_bar.widgets:
+        size_label.configure(text=text)
+        return
 
-def display_details(button: gui.Button, app: gui.App) -> None:
-    file_path: str = str(button.cget("text")) #type: ignore
+    app.details_bar.add_widget(
+        "folder_size_name",
+        ctk.CTkLabel,
+        text="Folder size",
+        fg_color="gray"
+    )
+    app.details_bar.add_widget("folder_size_val", ctk.CTkLabel, text=text)
+    app.details_bar.folder_size_name.pack(side=ctk.TOP, fill=ctk.BOTH)
+    app.details_bar.folder_size_val.pack(side=ctk.TOP, fill=ctk.BOTH)
 
-    previously_selected: gui.Button | None = app.extra_details.get("selected")
-    item_exists: bool = gui.widget_exists(previously_selected)
-    if previously_selected and item_exists:
-        previously_selected.configure(border_color="gray") #type: ignore
-    
-    if previously_selected is not button:
-        hover_color = button.cget("hover_color") #type: ignore
-        button.configure(border_color=hover_color) #type: ignore
 
-        app.extra_details["selected"] = button
+def _item_path(app: gui.App, item: gui.ListItem) -> Path:
+    """The full path of a list row, whether or not it is in `app.file_path`."""
+    if item.directory is not None:
+        return Path(item.text)
 
-    for widget in app.details_bar.widgets[:]:
-        app.details_bar.remove_widget(widget)
-    
-    file_path = os.path.join(app.file_path, file_path)
-    fetch_metadata(app, file_path, _update_details_bar)
+    return app.file_path + Path(item.text)
 
 
 def add_folder_to_prev_files(app: gui.App, file_path: Path) -> None:
@@ -191,9 +297,8 @@ def add_folder_to_prev_files(app: gui.App, file_path: Path) -> None:
     app.extra_details["curr_prev_dir_index"] = curr_prev_dir_index
 
 
-def open_folder(button: gui.Button, app: gui.App) -> None:
-    file_path: Path = Path(button.cget("text")) #type: ignore
-    full_file_path: Path = app.file_path + file_path
+def open_folder(item: gui.ListItem, app: gui.App) -> None:
+    full_file_path: Path = _item_path(app, item)
 
     if not full_file_path.valid_dir():
         errors.warn(
@@ -208,12 +313,12 @@ def open_folder(button: gui.Button, app: gui.App) -> None:
     populate_files(app)
 
 
-def open_file(button: gui.Button, app: gui.App) -> None:
+def open_file(item: gui.ListItem, app: gui.App) -> None:
     windows: bool = utils.platform() == "windows"
     macos: bool = utils.platform() == "darwin"
 
-    button_file: Path = Path(button.cget("text")) #type: ignore
-    file_path: Path = app.file_path + button_file
+    button_file: Path = Path(item.text)
+    file_path: Path = _item_path(app, item)
 
     if windows:
         os.startfile(file_path)
@@ -255,8 +360,17 @@ def get_files_elevated_permissions(app: gui.App) -> None:
         )
 
 
+def open_list_item(item: gui.ListItem, app: gui.App) -> None:
+    if item.note == "folder":
+        open_folder(item, app)
+        return
+
+    open_file(item, app)
+
+
 def populate_files(app: gui.App, refresh: bool = False) -> None:
-    app.main_section.scroll_to_top()
+    started: float = time.perf_counter()
+    app.main_section.files_list.scroll_to_top()
 
     file_path: Path = app.file_path
 
@@ -274,75 +388,309 @@ def populate_files(app: gui.App, refresh: bool = False) -> None:
     
     for widget in app.details_bar.widgets[:]:
         app.details_bar.remove_widget(widget)
+    app.extra_details["metadata"].cancel()
+    if refresh:
+        app.extra_details["metadata"].clear()
 
-    files_list: list[Path]
-    folders: list[Path]
+    directory_loader: loader.DirectoryLoader = app.extra_details["loader"]
+    app.extra_details["watcher"].watch(file_path)
 
-    if file_path in app.extra_details["directories"] and not refresh:
-        files_list = app.extra_details["directories"][file_path]["files"]
-        folders = (
-            app.extra_details["directories"][file_path]["folders"]
-        )
+    listings: listing_cache.ListingCache = app.extra_details["listing_cache"]
+    cached: listing_cache.CachedListing | None = (
+        None if refresh else listings.get(file_path)
+    )
+
+    if cached is not None:
+        directory_loader.cancel()
+        app.main_section.files_list.set_items(_build_list_items(
+            app,
+            cached.folders,
+            cached.files,
+            cached.entries
+        ))
     
     else:
-        files_list, folders = files.get_files_folders(file_path, use_exact=True)
-        app.extra_details["directories"][file_path] = {}
-        app.extra_details["directories"][file_path]["folders"] = folders
-        app.extra_details["directories"][file_path]["files"] = files_list
-
-
-    for _, folder in enumerate(folders):
-        app.main_section.add_button(gui.Button(
-            "folder",
-            app.main_section,
-            single_click=lambda button, x, folder=folder: display_details(button, app),
-            double_click=lambda button, x, folder=folder: open_folder(button, app),
-            bind_parent_scroll = True,
-            scroll_parent=app.main_section,
-            note="folder",
-            text=folder.exact_path,
-            border_width=1,
-            border_color="gray",
-            image=app.images["folder"],
-            compound=ctk.LEFT,
-            anchor="w"
-        ))
-        app.main_section.folder.pack(fill=ctk.X, padx=5)
-
-
-    for _, file in enumerate(files_list):
-        app.main_section.add_button(gui.Button(
-            "file",
-            app.main_section,
-            single_click=lambda button, x, file=file: display_details(button, app),
-            double_click=lambda button, x, file=file: open_file(button, app),
-            bind_parent_scroll = True,
-            scroll_parent=app.main_section,
-            note="file",
-            text=file.exact_path,
-            border_width=1,
-            border_color="gray",
-            image=app.images["file"],
-            compound=ctk.LEFT,
-            anchor="w"
-        ))
-        app.main_section.file.pack(fill=ctk.X, padx=5)
+        app.main_section.files_list.clear()
+        directory_loader.load(
+            file_path,
+            on_chunk=lambda chunk: _add_loaded_entries(app, chunk),
+            on_done=lambda scan: _finish_loading(app, scan, started),
+            on_error=lambda error: _handle_load_error(app, error),
+            on_preview=lambda scan: _show_listing(
+                app,
+                sorting.sort_paths(scan.folders),
+                sorting.sort_paths(scan.files),
+                scan.entries
+            )
+        )
 
+    app.extra_details["selected"] = app.main_section.files_list.selected
     app.details_bar.open_btn.configure(text="Open in terminal")
+    errors.event(
+        "populate_files",
+        time.perf_counter() - started,
+        cached=cached is not None,
+        entries=(
+            len(cached.folders) + len(cached.files)
+            if cached is not None
+            else None
+        )
+    )
+
+
+@profiling.profiled("list items")
+def _build_list_items(
+    app: gui.App,
+    folders: list[Path],
+    files_list: list[Path],
+    entries: dict[str, files.Entry]
+) -> list[gui.ListItem]:
+    """
+    Builds the rows for a listing whose folders and files are already in
+    name order, re-sorting them if another order is selected.
+    """
+    items: list[gui.ListItem] = [
+        gui.ListItem(folder.exact_path, "folder", entries.get(folder.exact_path))
+        for folder in folders
+    ]
+    items.extend(
+        gui.ListItem(file.exact_path, "file", entries.get(file.exact_path))
+        for file in files_list
+    )
+
+    order: str = _sort_order(app)
+    if order != "name":
+        items = sorting.sort_items(items, order)
+
+    return items
+
+
+def _add_loaded_entries(app: gui.App, chunk: list[files.Entry]) -> None:
+    app.main_section.files_list.append_items([
+        gui.ListItem(entry.name, "folder" if entry.is_dir else "file", entry)
+        for entry in chunk
+    ])
+
+
+def _finish_loading(
+    app: gui.App,
+    scan: files.ScanResult,
+    started: float
+) -> None:
+    errors.event(
+        "directory_load",
+        time.perf_counter() - started,
+        entries=len(scan)
+    )
+    listing: listing_cache.CachedListing = (
+        app.extra_details["listing_cache"].put(scan)
+    )
+    _show_listing(app, listing.folders, listing.files, listing.entries)
+
+
+def _show_listing(
+    app: gui.App,
+    folders: list[Path],
+    files_list: list[Path],
+    entries: dict[str, files.Entry]
+) -> None:
+    """Replaces the items in the file list, keeping the selected name."""
+    files_list_widget: gui.VirtualList = app.main_section.files_list
+    selected: gui.ListItem | None = files_list_widget.selected
+
+    items: list[gui.ListItem] = _build_list_items(app, folders, files_list, entries)
+    files_list_widget.set_items(items)
+
+    if selected is not None:
+        _, item = _find_list_item(
+            items,
+            selected.text,
+            selected.note,
+            _sort_order(app)
+        )
+        files_list_widget.select(item)
+
+    app.extra_details["selected"] = files_list_widget.selected
+
+
+def _handle_load_error(app: gui.App, error: OSError) -> None:
+    if isinstance(error, PermissionError):
+        get_files_elevated_permissions(app)
+
+
+def _sort_order(app: gui.App) -> str:
+    return app.extra_details.get("sort_order", "name")
+
+
+def set_sort_order(app: gui.App, order: str) -> None:
+    """Re-sorts the rows already in the file list, without rescanning."""
+    app.extra_details["sort_order"] = order
+
+    files_list: gui.VirtualList = app.main_section.files_list
+    files_list.set_items(sorting.sort_items(files_list.items, order))
+    if files_list.selected is not None:
+        files_list.see(files_list.selected)
+
+
+def _find_list_item(
+    items: list[gui.ListItem],
+    name: str,
+    note: str,
+    order: str = "name",
+    entry: files.Entry | None = None
+) -> tuple[int, gui.ListItem | None]:
+    """
+    Finds `name` in a sorted list of items with a binary search.
+
+    Returns the index of the item, or the index it would be inserted
+    at, along with the item itself if it is in the list. Orders other
+    than name need the item's stats for its key, so without `entry`
+    they fall back to a linear scan.
+    """
+    if order != "name" and entry is None:
+        for position, item in enumerate(items):
+            if item.text == name and item.note == note:
+                return (position, item)
+
+        return (len(items), None)
+
+    key: tuple[object, ...] = (note != "folder", sorting.entry_key(order, name, entry))
+    index: int = bisect.bisect_left(
+        items,
+        key,
+        key=lambda item: sorting.item_key(order, item)
+    )
+
+    position: int = index
+    while (
+        position < len(items)
+        and sorting.item_key(order, items[position]) == key
+    ):
+        if items[position].text == name:
+            return (position, items[position])
+        position += 1
+
+    return (index, None)
+
+
+def _apply_watch_events(app: gui.App, events: list[watcher.WatchEvent]) -> None:
+    listings: listing_cache.ListingCache = app.extra_details["listing_cache"]
+    changed: set[Path] = set()
+
+    for event in events:
+        if event.kind == "gone":
+            listings.invalidate(event.directory)
+            app.extra_details["watcher"].unwatch(event.directory)
+            continue
+
+        if event.kind == "rescan":
+            # Events were lost, so the listing is rebuilt from disk.
+            listings.invalidate(event.directory)
+            if (
+                event.directory == app.file_path
+                and not app.extra_details["loader"].loading
+            ):
+                populate_files(app)
+            continue
+
+        if event.kind in ("deleted", "renamed"):
+            listings.remove_entry(event.directory, event.name)
+
+        if event.kind in ("created", "renamed", "modified") and event.entry is not None:
+            listings.add_entry(event.directory, event.entry)
+
+        changed.add(event.directory)
+        for name in (event.name, event.new_name):
+            if name:
+                app.extra_details["metadata"].invalidate(event.directory + Path(name))
+        if event.kind != "modified":
+            app.extra_details["search_index"].apply_event(
+                event.directory,
+                event.name,
+                event.new_name
+            )
+
+        if (
+            event.directory == app.file_path
+            and not app.extra_details["loader"].loading
+        ):
+            _apply_list_event(app, event)
+
+    for directory in changed - {x.directory for x in events if x.kind == "rescan"}:
+        listings.revalidate(directory)
+
+
+def _apply_list_event(app: gui.App, event: watcher.WatchEvent) -> None:
+    files_list: gui.VirtualList = app.main_section.files_list
+
+    if event.kind in ("deleted", "renamed"):
+        for note in ("folder", "file"):
+            _, item = _find_list_item(
+                files_list.items,
+                event.name,
+                note,
+                _sort_order(app)
+            )
+            if item is not None:
+                files_list.remove_item(item)
+                break
+
+    if event.kind == "modified" and event.entry is not None:
+        note = "folder" if event.entry.is_dir else "file"
+        _, existing = _find_list_item(
+            files_list.items,
+            event.name,
+            note,
+            _sort_order(app)
+        )
+        if existing is not None:
+            # Moved to where its new stats sort, for size and date orders.
+            selected: bool = existing is files_list.selected
+            files_list.remove_item(existing)
+            existing.entry = event.entry
+            index, _ = _find_list_item(
+                files_list.items,
+                event.name,
+                note,
+                _sort_order(app),
+                event.entry
+            )
+            files_list.insert_item(index, existing)
+            if selected:
+                display_details(existing, app)
+
+    if event.kind in ("created", "renamed") and event.entry is not None:
+        note = "folder" if event.entry.is_dir else "file"
+        index, existing = _find_list_item(
+            files_list.items,
+            event.entry.name,
+            note,
+            _sort_order(app),
+            event.entry
+        )
+        if existing is None:
+            files_list.insert_item(
+                index,
+                gui.ListItem(event.entry.name, note, event.entry)
+            )
+
+    app.extra_details["selected"] = files_list.selected
 
 
 def delete_item(app: gui.App, item: Path | None = None, no_confirm: bool = False) -> None:
     path: Path
 
     if not item:
-        selected: Any | None = app.extra_details.get("selected")
+        selected: gui.ListItem | None = app.extra_details.get("selected")
 
         if not selected:
             return
         
-        path = Path(selected.cget("text"))
+        path = Path(selected.text)
+        if selected.directory is not None:
+            item = path
         
-        app.main_section.remove_widget(selected)
+        app.main_section.files_list.remove_item(selected)
 
     path = item or path
 
@@ -362,7 +710,8 @@ def delete_item(app: gui.App, item: Path | None = None, no_confirm: bool = False
             "In 'folder' if statement"
         )
         try:
-            shutil.rmtree((item or (app.file_path + path)).path)
+            with errors.timed("delete_item", kind="folder"):
+                shutil.rmtree((item or (app.file_path + path)).path)
             
             for item in app.details_bar.widgets:
                 app.details_bar.remove_widget(item)
@@ -374,24 +723,26 @@ def delete_item(app: gui.App, item: Path | None = None, no_confirm: bool = False
             )
             return
         
-        try:
-            app.extra_details["directories"][app.file_path]["folders"].remove(path)
-        except: pass
+        app.extra_details["listing_cache"].remove_entry(
+            app.file_path,
+            path.exact_path
+        )
         
         return
 
     try:
-        os.remove(item or ((app.file_path + path).path))
+        with errors.timed("delete_item", kind="file"):
+            os.remove(item or ((app.file_path + path).path))
     except PermissionError:
         errors.warn(
             app,
             "Permission Error",
             f"{repr(path)} could not be deleted."
         )
-    try:
-        app.extra_details["directories"][app.file_path]["files"].remove(path)
-    except:
-        pass
+    app.extra_details["listing_cache"].remove_entry(
+        app.file_path,
+        path.exact_path
+    )
     for item in app.details_bar.widgets:
         app.details_bar.remove_widget(item)
 
@@ -399,7 +750,7 @@ def delete_item(app: gui.App, item: Path | None = None, no_confirm: bool = False
 def rename_item(app: gui.App) -> None:
     def execute_rename() -> None:
         new_path: Path = Path(app.main_section.renamed_file.get())
-        new_full_path: Path = app.file_path + new_path
+        new_full_path: Path = Path(full_path.as_list()[:-1]) + new_path
 
         overwrite: bool = False
 
@@ -415,32 +766,53 @@ def rename_item(app: gui.App) -> None:
 
         try:
             os.rename(full_path, new_full_path)
-        except OSError:
+        except OSError as e:
+            errors.warn(
+                app,
+                "Rename failed",
+                f"{repr(full_path)} could not be renamed: {e}"
+            )
             populate_files(app)
 
         populate_files(app, refresh=True)
 
 
-    app_path: Path = app.file_path
-    selected_widget: Any | None = app.extra_details.get("selected")
-    if not selected_widget:
+    selected: gui.ListItem | None = app.extra_details.get("selected")
+    if not selected:
         return
     
-    selected_position = selected_widget.pack_info()
+    app.main_section.files_list.see(selected)
+    selected_row: gui.Button | None = app.main_section.files_list.row_for(selected)
+    if not selected_row:
+        return
     
-    item_path: Path = Path(selected_widget.cget("text"))
-    full_path: Path = app_path + item_path
+    # Search results hold a full path, so the new name goes in the
+    # item's own folder rather than the current one.
+    full_path: Path = _item_path(app, selected)
 
 
 
-    app.main_section.remove_widget(selected_widget)
     app.main_section.add_widget("renamed_file", ctk.CTkEntry)
-    app.main_section.renamed_file.pack(**selected_position)
+    app.main_section.renamed_file.place(in_=selected_row, relwidth=1, relheight=1)
     app.main_section.renamed_file.focus_set()
     app.main_section.renamed_file.bind("<FocusOut>", lambda x: execute_rename())
     app.main_section.renamed_file.bind("<Return>", lambda x: execute_rename())
     
 
+def _file_shortcut(action: Callable[[], Any]) -> Callable[[tk.Event[Any]], Any]:
+    """
+    Wraps a window-wide file shortcut so it does nothing while a text
+    entry, such as the search box, has focus, and the keys edit its text.
+    """
+    def handler(event: tk.Event[Any]) -> Any:
+        if isinstance(event.widget, tk.Entry):
+            return None
+
+        return action()
+
+    return handler
+
+
 def back_directory(app: gui.App) -> None:
     file_path: list[str] = app.file_path.as_list()
 
@@ -614,18 +986,21 @@ def new_file(app: gui.App, event: gui.tk.Event[Any]) -> None:
             with open(app.file_path + file_path, "x") as f: f.close()
 
         app.main_section.remove_widget(app.main_section.new_file)
-        app.root.bind("<BackSpace>", lambda x: back_directory(app))
+        app.root.bind(
+            "<BackSpace>",
+            _file_shortcut(lambda: back_directory(app))
+        )
         populate_files(app, refresh=True)
 
-    app.main_section.scroll_to_top()
+    app.main_section.files_list.scroll_to_top()
 
 
     app.main_section.add_widget("new_file", ctk.CTkEntry, placeholder_text="Input file name...")
-    top_item = app.main_section.widgets[2]
-    try:
-        app.main_section.new_file.pack(side="top", before=top_item, fill="x")
-    except:
-        app.main_section.new_file.pack(side="top", fill="x")
+    app.main_section.new_file.pack(
+        side="top",
+        before=app.main_section.files_list,
+        fill="x"
+    )
 
     app.main_section.new_file.focus_set()
 
@@ -640,14 +1015,12 @@ def copy(app: gui.App, cut: bool = False) -> None:
         "Execution",
         "copy() started"
     )
-    app_path: Path = app.file_path
 
-    selected: Any | None = app.extra_details.get("selected")
+    selected: gui.ListItem | None = app.extra_details.get("selected")
     if not selected:
         return
     
-    selected_path: Path = Path(selected.cget("text"))
-    full_path: Path = app_path + selected_path
+    full_path: Path = _item_path(app, selected)
 
     try:
         pyperclip.copy(str(full_path))
@@ -687,6 +1060,7 @@ def paste(app: gui.App) -> None:
                 + "please contact support."
             )
         )
+        return
 
     cut: bool = app.extra_details.get("cut", False)
 
@@ -700,24 +1074,120 @@ def paste(app: gui.App) -> None:
     directory = Path(path_as_list[:-1])
     file_ending = Path(path_as_list[-1])
 
-    if recent_copy.valid_file():
-        shutil.copy(recent_copy, app_path+file_ending)
-    else:
-        shutil.copytree(recent_copy, app_path+file_ending)
+    destination: Path = app_path + file_ending
+    transfers: transfer.TransferEngine = app.extra_details["transfers"]
 
-    populate_files(app, refresh=True)
+    def done(progress: transfer.TransferProgress) -> None:
+        errors.event(
+            "paste",
+            progress.elapsed,
+            cut=cut,
+            entries=progress.copied_files,
+            bytes=progress.copied_bytes
+        )
+        _finish_transfer(app)
+        if cut:
+            app.extra_details["cut"] = False
+            app.extra_details["listing_cache"].remove_entry(
+                directory,
+                file_ending.exact_path
+            )
+        populate_files(app, refresh=True)
 
-    if cut:
-        delete_item(app, recent_copy, no_confirm=True)
-    
-    if cut and recent_copy.valid_file():
-        app.extra_details["directories"][str(directory)]["files"].remove(str(file_ending))
+    def failed(error: Exception) -> None:
+        progress: transfer.TransferProgress = pasting.progress
+        errors.event(
+            "paste",
+            progress.elapsed,
+            cut=cut,
+            entries=progress.copied_files,
+            bytes=progress.copied_bytes,
+            ok=False,
+            error=type(error).__name__
+        )
+        _finish_transfer(app)
+        populate_files(app, refresh=True)
+        if not isinstance(error, transfer.TransferCancelled):
+            errors.warn(app, "Paste failed", str(error))
+
+    pasting: transfer.Transfer = transfers.start(transfer.Transfer(
+        recent_copy.path,
+        destination.path,
+        cut,
+        on_progress=lambda progress: _show_transfer_progress(app, progress),
+        on_done=done,
+        on_error=failed
+    ))
+    app.extra_details["transfer"] = pasting
+    app.title_bar.transfer_label.configure(text="Pasting...")
+    app.title_bar.transfer_label.pack(side=ctk.RIGHT, padx=5)
+    app.title_bar.cancel_transfer_btn.pack(side=ctk.RIGHT, padx=5)
+
+
+def _show_transfer_progress(app: gui.App, progress: transfer.TransferProgress) -> None:
+    app.title_bar.transfer_label.configure(text=transfer.describe(progress))
+
+
+def _finish_transfer(app: gui.App) -> None:
+    app.extra_details["transfer"] = None
+    if app.extra_details["transfers"].active:
         return
 
-    if cut and recent_copy.valid_dir():
-        app.extra_details["directories"][str(directory)]["folders"].remove(str(file_ending))
+    app.title_bar.transfer_label.pack_forget()
+    app.title_bar.cancel_transfer_btn.pack_forget()
+
+
+def cancel_transfer(app: gui.App) -> None:
+    app.extra_details["transfers"].cancel_all()
+
+
+def search_files(app: gui.App, query: str) -> None:
+    """
+    Searches the index for `query` and streams the matches into the file
+    list. An empty query goes back to the current directory.
+
+    The index covers the start directory and the global sort folders,
+    or the home directory if there are neither.
+    """
+    search_index: search.SearchIndex = app.extra_details["search_index"]
+
+    if not query.strip():
+        search_index.cancel_search()
+        populate_files(app)
         return
 
+    app.extra_details["loader"].cancel()
+    app.main_section.files_list.clear()
+    app.main_section.files_list.scroll_to_top()
+    for widget in app.details_bar.widgets[:]:
+        app.details_bar.remove_widget(widget)
+    app.extra_details["metadata"].cancel()
+
+    started: float = time.perf_counter()
+    search_index.search(
+        query.strip(),
+        on_chunk=lambda matches: app.main_section.files_list.append_items(
+            [search.item_for_result(path, is_dir) for path, is_dir in matches]
+        ),
+        on_done=lambda count: errors.info(
+            None,
+            "Search",
+            "%d matches for %r in %.3fs",
+            count,
+            query,
+            time.perf_counter() - started
+        )
+    )
+    app.extra_details["selected"] = None
+
+
+def _show_search_progress(app: gui.App, count: int, finished: bool) -> None:
+    app.title_bar.search_entry.configure(
+        placeholder_text=(
+            "Search files" if finished else f"Indexing... ({count} items)"
+        )
+    )
+
 
 def open_item(app: gui.App) -> None:
     current_item_is_folder: bool = app.extra_details["selected"].note == "folder"
@@ -740,6 +1210,141 @@ def open_item(app: gui.App) -> None:
         )
 
 
+def global_sort(app: gui.App, dry_run: bool = False) -> None:
+    """Runs the global sorter on a background thread."""
+    if app.extra_details.get("global_sort_running"):
+        return
+
+    user_settings: settings.Settings = app.extra_details["settings"]
+    if not user_settings.global_ai_rules.global_folders:
+        errors.warn(
+            root=app,
+            title="Nothing to sort",
+            message="No global folders are set in your settings."
+        )
+        return
+
+    def worker() -> None:
+        global_sorter: sorter.GlobalSorter = sorter.GlobalSorter(
+            user_settings.global_ai_rules,
+            dry_run=dry_run,
+            sniffer=content_sniffer(user_settings),
+            on_progress=lambda report: app.call_soon(
+                _show_sort_progress,
+                app,
+                str(report)
+            )
+        )
+        global_sorter.run()
+        app.call_soon(_finish_global_sort, app)
+
+    app.extra_details["global_sort_running"] = True
+    app.projects_bar.global_sort_btn.configure(text="Sorting...")
+    threading.Thread(target=worker, daemon=True).start()
+
+
+def _show_sort_progress(app: gui.App, progress: str) -> None:
+    app.projects_bar.global_sort_btn.configure(text="Sorting...")
+    errors.info(None, "Global sorter", progress)
+
+
+def _finish_global_sort(app: gui.App) -> None:
+    app.extra_details["global_sort_running"] = False
+    app.projects_bar.global_sort_btn.configure(text="Sort folders")
+    populate_files(app)
+
+
+def folder_sort(app: gui.App) -> None:
+    """
+    Sorts the current folder on a background thread, offering to resume
+    or roll back an earlier sort of it that was interrupted.
+    """
+    if app.extra_details.get("folder_sort_running") or app.file_path.exact_path == '':
+        return
+
+    user_settings: settings.Settings = app.extra_details["settings"]
+    folder_sorter: sorter.FolderSorter = sorter.FolderSorter(
+        app.file_path.path,
+        user_settings.local_ai_rules,
+        sniffer=content_sniffer(user_settings)
+    )
+    rollback: bool = False
+
+    if folder_sorter.interrupted:
+        rollback = not errors.confirm(
+            app,
+            "Interrupted sort",
+            "An earlier sort of this folder did not finish. Resume it? "
+            + "Choosing no puts every file back where it was."
+        )
+    elif not errors.confirm(
+        app,
+        "Sort folder",
+        f"Sort the files in {repr(app.file_path)} into sub-folders?"
+    ):
+        return
+
+    def worker() -> None:
+        if rollback:
+            folder_sorter.rollback()
+        else:
+            folder_sorter.run()
+        app.call_soon(_finish_folder_sort, app)
+
+    app.extra_details["folder_sort_running"] = True
+    threading.Thread(target=worker, daemon=True).start()
+
+
+def _finish_folder_sort(app: gui.App) -> None:
+    app.extra_details["folder_sort_running"] = False
+    populate_files(app, refresh=True)
+
+
+def content_sniffer(
+    user_settings: settings.Settings
+) -> content_sniff.ContentSniffer | None:
+    """The shared content sniffer, if content sniffing is turned on."""
+    if not user_settings.global_ai_rules.content_sniffing:
+        return None
+
+    return content_sniff.ContentSniffer(
+        (Path("Settings") + Path("contentCache.json")).path
+    )
+
+
+def launch_sort_on_close() -> None:
+    """
+    Starts an incremental global sort in a separate, detached process,
+    so closing the app never waits on it.
+    """
+    command: list[str] = [sys.executable]
+    if not getattr(sys, "frozen", False):
+        command.append(os.path.abspath(sys.argv[0]))
+    command.extend(["--sort", "--incremental"])
+
+    options: dict[str, Any] = {
+        "stdin": subprocess.DEVNULL,
+        "stdout": subprocess.DEVNULL,
+        "stderr": subprocess.DEVNULL,
+        "cwd": os.path.abspath("."),
+    }
+    if utils.platform() == "windows":
+        options["creationflags"] = (
+            subprocess.DETACHED_PROCESS #type: ignore
+            | subprocess.CREATE_NEW_PROCESS_GROUP #type: ignore
+        )
+    else:
+        options["start_new_session"] = True
+
+    try:
+        subprocess.Popen(command, **options)
+    except OSError as e:
+        errors.warn(None, "Sort on close failed", f"Could not start the sorter: {e}")
+        return
+
+    errors.info(None, "Sort on close", "Started the background sorter")
+
+
 def _update_details_bar(
     app: gui.App,
     metadata_dict: dict[str, str | Path | files.datetime | None]
@@ -780,6 +1385,26 @@ async def main() -> None:
     """The main method for Elysium."""
     parser: argparse.Namespace = setup_parser(sys.argv[1:], "Elysium 1.2.2")
 
+    if parser.sort:
+        sorting_settings: settings.Settings = get_settings(
+            Path("Settings") + Path("userSettings.json")
+        )
+        if parser.incremental:
+            sorter.incremental_sort(
+                sorting_settings.global_ai_rules,
+                (Path("Settings") + Path("sorterState.json")).path,
+                dry_run=parser.dry_run,
+                sniffer=content_sniffer(sorting_settings)
+            )
+            return
+
+        sorter.GlobalSorter(
+            sorting_settings.global_ai_rules,
+            dry_run=parser.dry_run,
+            sniffer=content_sniffer(sorting_settings)
+        ).run()
+        return
+
     app: gui.App = setup_app(parser)
     app.app_name = "Elysium"
     app.root_dir = Path()
@@ -798,6 +1423,12 @@ async def main() -> None:
 
     app.extra_details["settings"] = user_settings
 
+    if (
+        user_settings.global_ai_rules.sort_on_close
+        and user_settings.global_ai_rules.global_folders
+    ):
+        app.on_exit(launch_sort_on_close)
+
 
     if utils.platform() != "windows":
         app.root.iconphoto(True, gui.tk.PhotoImage(str(Path(
@@ -839,13 +1470,53 @@ async def main() -> None:
         Path([str(app.root_dir), "Images", "dark", "folder.png"])
     )
 
-    app.extra_details["directories"] = {
-        "": {
-            "files": [],
-            "folders": files.get_drives()
-        }
-    }
+    app.extra_details["listing_cache"] = listing_cache.ListingCache()
     app.extra_details["selected"] = None
+    app.extra_details["loader"] = loader.DirectoryLoader(
+        app,
+        index=(
+            metadata_index.MetadataIndex(
+                app.root_dir
+                + Path("Settings")
+                + Path("metadataIndex.sqlite3")
+            )
+            if user_settings.metadata_index
+            else None
+        )
+    )
+    app.extra_details["metadata"] = metadata_service.MetadataService(app)
+    app.extra_details["folder_size"] = folder_size.FolderSizeCalculator(app)
+    app.extra_details["overlay"] = profiling.PerformanceOverlay(app)
+    app.extra_details["watchdog"] = profiling.LoopWatchdog(app)
+    app.extra_details["watchdog"].start()
+    app.on_exit(app.extra_details["watchdog"].stop)
+    app.extra_details["transfers"] = transfer.TransferEngine(
+        app,
+        copy_workers=user_settings.copy_workers
+    )
+    app.on_exit(app.extra_details["transfers"].cancel_all)
+    # The index covers the start directory and the global sort folders.
+    # Starting on the drives list with no global folders leaves nothing
+    # to index, so the home directory is searched instead.
+    app.extra_details["search_index"] = search.SearchIndex(
+        app,
+        [
+            Path(x) for x in (
+                [app.file_path.exact_path]
+                + user_settings.global_ai_rules.global_folders
+            )
+            if x
+        ] or [Path(os.path.expanduser("~"))],
+        on_progress=lambda count, finished: _show_search_progress(
+            app,
+            count,
+            finished
+        )
+    )
+    app.extra_details["watcher"] = watcher.DirectoryWatcher(
+        app,
+        on_events=lambda events: _apply_watch_events(app, events)
+    )
 
     app.add_frame(gui.Frame(
         "title_bar",
@@ -862,7 +1533,7 @@ async def main() -> None:
         border_color="gray",
         border_width=1
     ))
-    app.add_frame(gui.ScrollableFrame(
+    app.add_frame(gui.Frame(
         "main_section",
         app.root,
         border_color="gray",
@@ -897,6 +1568,44 @@ async def main() -> None:
     app.title_bar.search.pack(side=ctk.LEFT, padx=10, fill=ctk.X)
     app.display_fp_widget = app.title_bar.search
 
+    app.title_bar.add_widget(
+        "sort_menu",
+        ctk.CTkOptionMenu,
+        values=[order.title() for order in sorting.ORDERS],
+        command=lambda choice: set_sort_order(app, choice.lower()),
+        width=110
+    )
+    app.title_bar.sort_menu.pack(side=ctk.RIGHT, padx=5)
+
+    app.title_bar.add_widget(
+        "search_entry",
+        ctk.CTkEntry,
+        placeholder_text="Search files",
+        width=250
+    )
+    app.title_bar.search_entry.pack(side=ctk.RIGHT, padx=10)
+    app.title_bar.search_entry.bind(
+        "<Return>",
+        lambda event: search_files(app, app.title_bar.search_entry.get())
+    )
+    app.title_bar.search_entry.bind(
+        "<Escape>",
+        lambda event: (
+            app.title_bar.search_entry.delete(0, ctk.END),
+            search_files(app, "")
+        )
+    )
+
+    # Only packed while a paste is running.
+    app.title_bar.add_widget("transfer_label", ctk.CTkLabel, text="")
+    app.title_bar.add_button(gui.Button(
+        "cancel_transfer_btn",
+        app.title_bar,
+        single_click=lambda button, event: cancel_transfer(app),
+        text="Cancel",
+        width=60
+    ))
+
     app.title_bar.add_button(gui.Button(
         "settings_btn",
         app.title_bar,
@@ -933,6 +1642,22 @@ async def main() -> None:
     ))
     app.projects_bar.color_mode_btn.pack(side=ctk.LEFT)
 
+    app.projects_bar.add_button(gui.Button(
+        "global_sort_btn",
+        app.projects_bar,
+        single_click=lambda button, event: global_sort(app),
+        text="Sort folders"
+    ))
+    app.projects_bar.global_sort_btn.pack(side=ctk.LEFT)
+
+    app.projects_bar.add_button(gui.Button(
+        "folder_sort_btn",
+        app.projects_bar,
+        single_click=lambda button, event: folder_sort(app),
+        text="Sort this folder"
+    ))
+    app.projects_bar.folder_sort_btn.pack(side=ctk.LEFT)
+
     app.main_section.add_widget("title", ctk.CTkLabel, text="FILES")
     app.main_section.block_deletion(app.main_section.title)
     app.main_section.title.pack(side=ctk.TOP)
@@ -941,6 +1666,19 @@ async def main() -> None:
     app.main_section.block_deletion(app.main_section.separator)
     app.main_section.separator.pack(side=ctk.TOP, fill=ctk.X, padx=10, pady=10)
 
+    app.main_section.add_frame(gui.VirtualList(
+        "files_list",
+        app.main_section,
+        single_click=lambda item, event: display_details(item, app),
+        double_click=lambda item, event: open_list_item(item, app),
+        images={
+            "folder": app.images["folder"],
+            "file": app.images["file"]
+        },
+        on_view_change=lambda start, stop: _schedule_prefetch(app, start, stop)
+    ))
+    app.main_section.files_list.pack(side=ctk.TOP, fill=ctk.BOTH, expand=True)
+
     app.details_bar.add_widget("title", ctk.CTkLabel, text="DETAILS")
     app.details_bar.title.pack(side=ctk.TOP)
     app.details_bar.block_deletion(app.details_bar.title)
@@ -964,16 +1702,17 @@ async def main() -> None:
     app.details_bar.pack(side=ctk.LEFT, fill=ctk.Y)
 
 
-    app.root.bind("<BackSpace>", lambda x: back_directory(app))
+    app.root.bind("<BackSpace>", _file_shortcut(lambda: back_directory(app)))
     app.root.bind("<Control-r>", lambda x: populate_files(app, refresh=True))
     app.root.bind("<F5>", lambda x: populate_files(app, refresh=True))
-    app.root.bind("<Delete>", lambda event: delete_item(app))
-    app.root.bind("<F2>", lambda event: rename_item(app))
-    app.root.bind("<Control-c>", lambda event: copy(app))
-    app.root.bind("<Control-x>", lambda event: copy(app, cut=True))
-    app.root.bind("<Control-v>", lambda event: paste(app))
-    app.root.bind("<Alt-Left>", lambda event: previous_directory(app))
-    app.root.bind("<Alt-Right>", lambda event: forward_directory(app))
+    app.root.bind("<F12>", lambda event: app.extra_details["overlay"].toggle())
+    app.root.bind("<Delete>", _file_shortcut(lambda: delete_item(app)))
+    app.root.bind("<F2>", _file_shortcut(lambda: rename_item(app)))
+    app.root.bind("<Control-c>", _file_shortcut(lambda: copy(app)))
+    app.root.bind("<Control-x>", _file_shortcut(lambda: copy(app, cut=True)))
+    app.root.bind("<Control-v>", _file_shortcut(lambda: paste(app)))
+    app.root.bind("<Alt-Left>", _file_shortcut(lambda: previous_directory(app)))
+    app.root.bind("<Alt-Right>", _file_shortcut(lambda: forward_directory(app)))
 
     populate_files(app)
 
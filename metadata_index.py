@@ -0,0 +1,175 @@
+from __future__ import annotations
+import sqlite3
+import threading
+import time
+
+import errors
+import files
+from files import Path
+
+
+class MetadataIndex:
+    """
+    A persistent SQLite index of the directories that have been browsed.
+
+    Each directory is stored with the mtime it had when it was scanned,
+    along with the stat record of every entry, as `files.Entry` holds
+    it. Owners and types are not stored, since they are cheap to work
+    out again from the UID and name when details are shown. A stored
+    listing is only trusted while the directory's mtime still matches.
+    Once the index holds more than `max_entries` entries, the least
+    recently used directories are dropped.
+    """
+    # Bumped when the tables change. An index with an older version is
+    # dropped and rebuilt, as it only ever holds what a rescan restores.
+    VERSION: int = 2
+    SCHEMA: str = """
+        CREATE TABLE IF NOT EXISTS directories (
+            path TEXT PRIMARY KEY,
+            st_mtime_ns INTEGER,
+            entry_count INTEGER NOT NULL,
+            last_used REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS entries (
+            directory TEXT NOT NULL,
+            name TEXT NOT NULL,
+            is_dir INTEGER NOT NULL,
+            st_mode INTEGER NOT NULL,
+            st_size INTEGER NOT NULL,
+            st_mtime REAL NOT NULL,
+            st_uid INTEGER NOT NULL,
+            st_ino INTEGER NOT NULL,
+            st_dev INTEGER NOT NULL,
+            st_nlink INTEGER NOT NULL,
+            PRIMARY KEY (directory, name)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS directories_last_used
+            ON directories (last_used);
+    """
+
+    def __init__(self, file_path: Path, max_entries: int = 2_000_000) -> None:
+        self.max_entries: int = max_entries
+        self._lock: threading.Lock = threading.Lock()
+        self._connection: sqlite3.Connection = sqlite3.connect(
+            file_path.path,
+            check_same_thread=False
+        )
+
+        with self._lock, self._connection:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            version: int = self._connection.execute(
+                "PRAGMA user_version"
+            ).fetchone()[0]
+            if version != self.VERSION:
+                self._connection.execute("DROP TABLE IF EXISTS entries")
+                self._connection.execute("DROP TABLE IF EXISTS directories")
+                self._connection.execute(f"PRAGMA user_version = {self.VERSION}")
+            self._connection.executescript(self.SCHEMA)
+
+    def load(self, directory: Path) -> files.ScanResult | None:
+        """
+        Returns the stored listing for `directory`, whether or not it is
+        still current. Compare its `st_mtime_ns` with
+        `files.directory_mtime` to find out.
+        """
+        key: str = directory.exact_path
+
+        with self._lock, self._connection:
+            row: tuple[int | None] | None = self._connection.execute(
+                "SELECT st_mtime_ns FROM directories WHERE path = ?",
+                (key,)
+            ).fetchone()
+            if row is None:
+                return None
+
+            self._connection.execute(
+                "UPDATE directories SET last_used = ? WHERE path = ?",
+                (time.time(), key)
+            )
+            rows: list[tuple[str, int, int, int, float, int, int, int, int]] = (
+                self._connection.execute(
+                    "SELECT name, is_dir, st_mode, st_size, st_mtime, st_uid, "
+                    + "st_ino, st_dev, st_nlink FROM entries WHERE directory = ?",
+                    (key,)
+                ).fetchall()
+            )
+
+        result: files.ScanResult = files.ScanResult(directory)
+        result.st_mtime_ns = row[0]
+        for name, is_dir, *stats in rows:
+            result.add(files.Entry(name, bool(is_dir), *stats))
+
+        return result
+
+    def store(self, scan: files.ScanResult) -> None:
+        """Replaces the stored listing for a directory with a fresh scan."""
+        if scan.directory.exact_path == '':
+            return
+
+        key: str = scan.directory.exact_path
+        rows: list[tuple[object, ...]] = []
+
+        for entry in scan.entries.values():
+            rows.append((
+                key,
+                entry.name,
+                int(entry.is_dir),
+                entry.st_mode,
+                entry.st_size,
+                entry.st_mtime,
+                entry.st_uid,
+                entry.st_ino,
+                entry.st_dev,
+                entry.st_nlink
+            ))
+
+        try:
+            with self._lock, self._connection:
+                self._connection.execute(
+                    "DELETE FROM entries WHERE directory = ?",
+                    (key,)
+                )
+                self._connection.executemany(
+                    "INSERT INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    rows
+                )
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO directories VALUES (?, ?, ?, ?)",
+                    (key, scan.st_mtime_ns, len(rows), time.time())
+                )
+                self._enforce_cap()
+        except sqlite3.Error as e:
+            errors.warn(
+                None,
+                "Metadata index error",
+                f"Could not index {repr(scan.directory)}: {e}"
+            )
+
+    def forget(self, directory: Path) -> None:
+        with self._lock, self._connection:
+            self._remove(directory.exact_path)
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+    def _enforce_cap(self) -> None:
+        total: int = self._connection.execute(
+            "SELECT COALESCE(SUM(entry_count), 0) FROM directories"
+        ).fetchone()[0]
+
+        while total > self.max_entries:
+            oldest: tuple[str, int] | None = self._connection.execute(
+                "SELECT path, entry_count FROM directories "
+                + "ORDER BY last_used LIMIT 1"
+            ).fetchone()
+            if oldest is None:
+                return
+
+            self._remove(oldest[0])
+            total -= oldest[1]
+
+    def _remove(self, key: str) -> None:
+        self._connection.execute("DELETE FROM entries WHERE directory = ?", (key,))
+        self._connection.execute("DELETE FROM directories WHERE path = ?", (key,))
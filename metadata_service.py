@@ -0,0 +1,218 @@
+from __future__ import annotations
+from collections import OrderedDict
+import itertools
+import queue
+import threading
+import time
+from typing import Any, Callable
+
+import files
+from files import Path
+import gui
+
+
+Metadata = dict[str, "str | Path | files.datetime | None"]
+
+_FOREGROUND: int = 0
+_PREFETCH: int = 1
+
+
+class MetadataService:
+    """
+    Fetches file metadata on a small, fixed pool of worker threads.
+
+    Every `fetch` is numbered, and only the newest one is rendered:
+    results for older requests are dropped on the Tk thread, and a
+    request that is already stale when a worker picks it up is skipped
+    without touching the disk. Requests for a path that is already
+    queued are coalesced into the queued one. Results are handed back
+    through `App.call_soon`, so callbacks always run on the Tk thread.
+
+    `prefetch` warms a bounded cache for rows that are likely to be
+    clicked next. Prefetches sit behind every `fetch` in the queue, and
+    a new batch replaces the last one, so they never hold up navigation.
+    Cached metadata is served straight from `fetch` until it is
+    `max_age` seconds old or invalidated.
+    """
+    def __init__(
+        self,
+        app: gui.App,
+        max_workers: int = 2,
+        max_cached: int = 2048,
+        max_age: float = 30.0
+    ) -> None:
+        self._app: gui.App = app
+        self._requests: queue.PriorityQueue[tuple[int, int, Path]] = (
+            queue.PriorityQueue()
+        )
+        self._order: itertools.count[int] = itertools.count()
+        self._lock: threading.Lock = threading.Lock()
+        self._pending: dict[
+            Path,
+            tuple[files.Entry | None, list[tuple[int, Callable[[Metadata], Any]]]]
+        ] = {}
+        self._prefetching: dict[Path, tuple[files.Entry | None, int]] = {}
+        self._latest: int = 0
+        self._prefetch_batch: int = 0
+
+        self._cache: OrderedDict[Path, tuple[float, Metadata]] = OrderedDict()
+        self._max_cached: int = max_cached
+        self._max_age: float = max_age
+
+        self._workers: list[threading.Thread] = [
+            threading.Thread(target=self._worker, daemon=True)
+            for _ in range(max_workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def fetch(
+        self,
+        file_path: Path,
+        callback: Callable[[Metadata], Any],
+        entry: files.Entry | None = None
+    ) -> None:
+        """
+        Requests the metadata for `file_path`, superseding every earlier
+        request.
+
+        Args:
+            file_path (Path): The file or folder to describe.
+            callback (Callable[[Metadata], Any]): Called on the Tk thread
+                with the result of `files.get_file_metadata`, unless a
+                newer request has been made by then. Cached metadata is
+                passed to it before `fetch` returns.
+            entry (files.Entry | None): A stat record to use instead of
+                stat-ing the file again.
+        """
+        with self._lock:
+            self._latest += 1
+            cached: Metadata | None = self._cached(file_path)
+
+            if cached is None:
+                pending = self._pending.get(file_path)
+                if pending is not None:
+                    pending[1].append((self._latest, callback))
+                    return
+
+                self._pending[file_path] = (entry, [(self._latest, callback)])
+
+        if cached is not None:
+            callback(cached)
+            return
+
+        self._requests.put((_FOREGROUND, next(self._order), file_path))
+
+    def prefetch(self, items: list[tuple[Path, files.Entry | None]]) -> None:
+        """
+        Warms the cache for `items`, in order, replacing any prefetch
+        still queued.
+        """
+        with self._lock:
+            self._prefetch_batch += 1
+            self._prefetching.clear()
+            queued: list[Path] = []
+
+            for file_path, entry in items:
+                if file_path in self._pending or self._cached(file_path) is not None:
+                    continue
+
+                self._prefetching[file_path] = (entry, self._prefetch_batch)
+                queued.append(file_path)
+
+        for file_path in queued:
+            self._requests.put((_PREFETCH, next(self._order), file_path))
+
+    def cached(self, file_path: Path) -> Metadata | None:
+        with self._lock:
+            return self._cached(file_path)
+
+    def cancel(self) -> None:
+        """Drops every request and prefetch made so far."""
+        with self._lock:
+            self._latest += 1
+            self._prefetch_batch += 1
+            self._prefetching.clear()
+
+    def invalidate(self, file_path: Path) -> None:
+        with self._lock:
+            self._cache.pop(file_path, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+    def _cached(self, file_path: Path) -> Metadata | None:
+        cached: tuple[float, Metadata] | None = self._cache.get(file_path)
+        if cached is None:
+            return None
+
+        if time.monotonic() - cached[0] > self._max_age:
+            del self._cache[file_path]
+            return None
+
+        self._cache.move_to_end(file_path)
+        return cached[1]
+
+    def _store(self, file_path: Path, metadata: Metadata) -> None:
+        if "Error" in metadata:
+            return
+
+        self._cache[file_path] = (time.monotonic(), metadata)
+        self._cache.move_to_end(file_path)
+        while len(self._cache) > self._max_cached:
+            self._cache.popitem(last=False)
+
+    def _worker(self) -> None:
+        while True:
+            priority, _, file_path = self._requests.get()
+
+            if priority == _PREFETCH:
+                self._run_prefetch(file_path)
+                continue
+
+            with self._lock:
+                entry, callbacks = self._pending[file_path]
+                if all(request < self._latest for request, _ in callbacks):
+                    del self._pending[file_path]
+                    continue
+
+            metadata: Metadata = files.get_file_metadata(file_path, entry)
+
+            with self._lock:
+                _, callbacks = self._pending.pop(file_path)
+                self._store(file_path, metadata)
+
+            for request, callback in callbacks:
+                self._app.call_soon(self._deliver, request, callback, metadata)
+
+    def _run_prefetch(self, file_path: Path) -> None:
+        with self._lock:
+            queued: tuple[files.Entry | None, int] | None = (
+                self._prefetching.pop(file_path, None)
+            )
+            if (
+                queued is None
+                or queued[1] != self._prefetch_batch
+                or file_path in self._pending
+                or file_path in self._cache
+            ):
+                return
+
+        metadata: Metadata = files.get_file_metadata(file_path, queued[0])
+
+        with self._lock:
+            if queued[1] == self._prefetch_batch:
+                self._store(file_path, metadata)
+
+        # Give the Tk thread the GIL between prefetches.
+        time.sleep(0)
+
+    def _deliver(
+        self,
+        request: int,
+        callback: Callable[[Metadata], Any],
+        metadata: Metadata
+    ) -> None:
+        if request == self._latest:
+            callback(metadata)
@@ -0,0 +1,384 @@
+from __future__ import annotations
+from collections import Counter, deque
+from contextlib import contextmanager
+import functools
+import os
+import sys
+import threading
+import time
+import traceback
+from typing import Any, Callable, Iterator, TypeVar
+
+import customtkinter as ctk #type: ignore
+
+import errors
+import gui
+
+
+_Function = TypeVar("_Function", bound=Callable[..., Any])
+
+# Upper bounds, in milliseconds, of the buckets `Histogram.buckets` counts.
+BUCKETS: tuple[float, ...] = (1, 4, 16, 64, 256, float("inf"))
+
+
+class Histogram:
+    """
+    The most recent `size` timings of one section, in seconds.
+
+    Older samples fall out of the window, so the percentiles reflect how
+    the app is behaving now rather than since it started.
+    """
+    __slots__ = ("_samples", "_lock", "count", "last")
+
+    def __init__(self, size: int = 512) -> None:
+        self._samples: deque[float] = deque(maxlen=size)
+        self._lock: threading.Lock = threading.Lock()
+        self.count: int = 0
+        self.last: float = 0.0
+
+    def add(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+            self.count += 1
+            self.last = seconds
+
+    def samples(self) -> list[float]:
+        with self._lock:
+            return list(self._samples)
+
+    def percentile(self, fraction: float) -> float:
+        samples: list[float] = sorted(self.samples())
+        if not samples:
+            return 0.0
+
+        return samples[min(len(samples) - 1, int(fraction * len(samples)))]
+
+    def buckets(self) -> list[int]:
+        """How many samples in the window fall under each of `BUCKETS`."""
+        counts: list[int] = [0] * len(BUCKETS)
+        for sample in self.samples():
+            milliseconds: float = sample * 1000
+            for position, bound in enumerate(BUCKETS):
+                if milliseconds < bound:
+                    counts[position] += 1
+                    break
+
+        return counts
+
+
+class Profiler:
+    """
+    Keeps a rolling `Histogram` per named section.
+
+    Recording costs a clock read and a deque append, so sections can be
+    left on hot paths. Set `enabled` to False to skip even that.
+    """
+    def __init__(self, window: int = 512) -> None:
+        self.enabled: bool = True
+        self._window: int = window
+        self._histograms: dict[str, Histogram] = {}
+        self._lock: threading.Lock = threading.Lock()
+
+    def record(self, name: str, seconds: float) -> None:
+        if not self.enabled:
+            return
+
+        histogram: Histogram | None = self._histograms.get(name)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(name, Histogram(self._window))
+
+        histogram.add(seconds)
+
+    @contextmanager
+    def section(self, name: str) -> Iterator[None]:
+        started: float = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    def profiled(self, name: str) -> Callable[[_Function], _Function]:
+        """Decorates a function so every call is recorded under `name`."""
+        def decorator(function: _Function) -> _Function:
+            @functools.wraps(function)
+            def wrapper(*args: Any, **kwargs: Any) -> Any:
+                if not self.enabled:
+                    return function(*args, **kwargs)
+
+                started: float = time.perf_counter()
+                try:
+                    return function(*args, **kwargs)
+                finally:
+                    self.record(name, time.perf_counter() - started)
+
+            return wrapper #type: ignore
+
+        return decorator
+
+    def histograms(self) -> dict[str, Histogram]:
+        with self._lock:
+            return dict(self._histograms)
+
+    def report(self) -> str:
+        """A fixed-width table of every section, for the overlay."""
+        lines: list[str] = [
+            f"{'section':<20}{'calls':>7}{'last':>9}{'p50':>9}{'p95':>9}{'max':>9}"
+            + "  " + " ".join(f"<{x:g}" for x in BUCKETS[:-1]) + " more",
+        ]
+        for name, histogram in sorted(self.histograms().items()):
+            samples: list[float] = histogram.samples()
+            lines.append(
+                f"{name[:19]:<20}{histogram.count:>7}"
+                + f"{histogram.last * 1000:>9.1f}"
+                + f"{histogram.percentile(0.5) * 1000:>9.1f}"
+                + f"{histogram.percentile(0.95) * 1000:>9.1f}"
+                + f"{max(samples, default=0.0) * 1000:>9.1f}"
+                + "  " + " ".join(f"{x:>3}" for x in histogram.buckets())
+            )
+
+        return "\n".join(lines)
+
+
+profiler: Profiler = Profiler()
+record = profiler.record
+section = profiler.section
+profiled = profiler.profiled
+
+
+class LagProbe:
+    """
+    Measures how late the Tk event loop runs a `root.after` callback.
+
+    A callback is scheduled every `interval` milliseconds, and how much
+    later than asked for it actually ran is recorded as "tk loop lag".
+    Lag is time the loop spent on something else, such as a slow event
+    handler.
+    """
+    def __init__(self, app: gui.App, interval: int = 100) -> None:
+        self._app: gui.App = app
+        self._interval: int = interval
+        self._expected: float = 0.0
+        self._job: str | None = None
+
+    def start(self) -> None:
+        self._expected = time.perf_counter() + self._interval / 1000
+        self._job = self._app.root.after(self._interval, self._tick)
+
+    def stop(self) -> None:
+        if self._job is not None:
+            self._app.root.after_cancel(self._job)
+            self._job = None
+
+    def _tick(self) -> None:
+        now: float = time.perf_counter()
+        record("tk loop lag", max(0.0, now - self._expected))
+        self._expected = now + self._interval / 1000
+        self._job = self._app.root.after(self._interval, self._tick)
+
+
+_SOURCE_DIRECTORY: str = os.path.dirname(os.path.abspath(__file__))
+
+
+class LoopWatchdog(LagProbe):
+    """
+    A `LagProbe` that also finds out what blocked the event loop.
+
+    The heartbeat marks the time every time it runs. A sampler thread
+    checks it every `sample_interval` seconds, and once the heartbeat is
+    more than `threshold` seconds late it samples the Tk thread's stack
+    with `sys._current_frames`. When the loop recovers, the stall is
+    logged as a warning and an event, naming the function that was on
+    the stack most often. That is the deepest frame from Elysium's own
+    code, so a stall inside `shutil.rmtree` is put down to its caller.
+    The full stack goes in the event rather than the log, which keeps
+    every message on one line.
+    """
+    def __init__(
+        self,
+        app: gui.App,
+        interval: int = 100,
+        threshold: float = 0.25,
+        sample_interval: float = 0.05
+    ) -> None:
+        super().__init__(app, interval)
+        self.threshold: float = threshold
+        self._sample_interval: float = sample_interval
+        self._last_beat: float = time.perf_counter()
+        self._loop_thread: int = threading.get_ident()
+        self._stop: threading.Event = threading.Event()
+        self._sampler: threading.Thread | None = None
+
+    def start(self) -> None:
+        self._loop_thread = threading.get_ident()
+        self._last_beat = time.perf_counter()
+        self._stop.clear()
+        super().start()
+
+        self._sampler = threading.Thread(
+            target=self._sample,
+            name="loop-watchdog",
+            daemon=True
+        )
+        self._sampler.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        super().stop()
+
+    def _tick(self) -> None:
+        self._last_beat = time.perf_counter()
+        super()._tick()
+
+    def _sample(self) -> None:
+        functions: Counter[str] = Counter()
+        stacks: dict[str, list[str]] = {}
+        stalled_since: float | None = None
+
+        while not self._stop.wait(self._sample_interval):
+            last_beat: float = self._last_beat
+            late: float = (
+                time.perf_counter() - last_beat - self._interval / 1000
+            )
+
+            if late > self.threshold:
+                if stalled_since is not None and last_beat != stalled_since:
+                    # The loop recovered and stalled again between samples.
+                    self._report(
+                        last_beat - stalled_since - self._interval / 1000,
+                        functions,
+                        stacks
+                    )
+                    functions = Counter()
+                    stacks = {}
+
+                stalled_since = last_beat
+                frame = sys._current_frames().get(self._loop_thread)
+                if frame is None:
+                    continue
+
+                stack: traceback.StackSummary = traceback.extract_stack(frame)
+                function: str = _blocking_function(stack)
+                functions[function] += 1
+                stacks.setdefault(function, stack.format())
+                continue
+
+            if stalled_since is None or last_beat == stalled_since:
+                continue
+
+            # The heartbeat has run again, so the stall is over.
+            self._report(
+                last_beat - stalled_since - self._interval / 1000,
+                functions,
+                stacks
+            )
+            functions = Counter()
+            stacks = {}
+            stalled_since = None
+
+    def _report(
+        self,
+        duration: float,
+        functions: Counter[str],
+        stacks: dict[str, list[str]]
+    ) -> None:
+        record("tk loop stall", duration)
+        if not functions:
+            return
+
+        function, samples = functions.most_common(1)[0]
+        errors.warn(
+            None,
+            "Event loop stall",
+            "Tk loop blocked for %.0f ms in %s (%d of %d samples)",
+            duration * 1000,
+            function,
+            samples,
+            sum(functions.values())
+        )
+        errors.event(
+            "loop_stall",
+            duration,
+            function=function,
+            samples=sum(functions.values()),
+            stack=[frame.rstrip() for frame in stacks[function]]
+        )
+
+
+def _blocking_function(stack: traceback.StackSummary) -> str:
+    """
+    The deepest frame of `stack` from Elysium's own code, leaving out
+    this module, or the deepest frame if none are.
+    """
+    for frame in reversed(stack):
+        file_name: str = os.path.abspath(frame.filename)
+        if (
+            os.path.dirname(file_name) == _SOURCE_DIRECTORY
+            and file_name != os.path.abspath(__file__)
+        ):
+            return f"{frame.name} ({os.path.basename(file_name)}:{frame.lineno})"
+
+    frame = stack[-1]
+    return f"{frame.name} ({os.path.basename(frame.filename)}:{frame.lineno})"
+
+
+class PerformanceOverlay:
+    """
+    A small window with the profiler's recent timings, refreshed every
+    `refresh_interval` milliseconds while it is open.
+    """
+    def __init__(self, app: gui.App, refresh_interval: int = 500) -> None:
+        self._app: gui.App = app
+        self._refresh_interval: int = refresh_interval
+        self._window: ctk.CTkToplevel | None = None
+        self._text: ctk.CTkTextbox | None = None
+        self._job: str | None = None
+
+    @property
+    def visible(self) -> bool:
+        return self._window is not None
+
+    def toggle(self) -> None:
+        if self.visible:
+            self.hide()
+        else:
+            self.show()
+
+    def show(self) -> None:
+        if self._window is not None:
+            return
+
+        self._window = ctk.CTkToplevel(self._app.root)
+        self._window.title("Performance")
+        self._window.geometry("720x320")
+        self._window.protocol("WM_DELETE_WINDOW", self.hide)
+        self._text = ctk.CTkTextbox(
+            self._window,
+            font=("Courier", 12),
+            wrap="none"
+        )
+        self._text.pack(fill=ctk.BOTH, expand=True)
+        self._refresh()
+
+    def hide(self) -> None:
+        if self._job is not None:
+            self._app.root.after_cancel(self._job)
+            self._job = None
+
+        if self._window is not None:
+            self._window.destroy()
+
+        self._window = None
+        self._text = None
+
+    def _refresh(self) -> None:
+        if self._text is None:
+            return
+
+        with section("overlay refresh"):
+            self._text.configure(state="normal")
+            self._text.delete("1.0", ctk.END)
+            self._text.insert("1.0", "Times in ms\n" + profiler.report())
+            self._text.configure(state="disabled")
+
+        self._job = self._app.root.after(self._refresh_interval, self._refresh)
@@ -0,0 +1,426 @@
+from __future__ import annotations
+import fnmatch
+import os
+import re
+import threading
+import time
+from typing import Any, Callable, Iterable, Iterator
+
+import errors
+from files import Path
+import gui
+
+
+_GLOB_CHARACTERS: re.Pattern[str] = re.compile(r"[*?\[\]]")
+_GLOB_CLASSES: re.Pattern[str] = re.compile(r"\[[^\]]*\]")
+# The longest a match waits before its chunk is posted, in seconds.
+_STREAM_INTERVAL: float = 0.1
+
+
+def _trigrams(text: str) -> set[str]:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class TrigramIndex:
+    """
+    An in-memory filename index keyed by lowercase trigrams.
+
+    Every name is split into its three-character substrings, and each
+    trigram maps to the ids of the paths containing it. A substring
+    query only has to check the paths in the intersection of its
+    trigrams' posting sets, rather than every name in the index.
+    """
+    def __init__(self) -> None:
+        self._paths: list[str | None] = []
+        self._names: list[str] = []
+        self._folders: list[bool] = []
+        self._ids: dict[str, int] = {}
+        self._postings: dict[str, set[int]] = {}
+        self._free: list[int] = []
+
+    def add(self, path: str, is_dir: bool = False) -> None:
+        if path in self._ids:
+            return
+
+        name: str = os.path.basename(path.rstrip(os.sep)).lower()
+
+        if self._free:
+            path_id: int = self._free.pop()
+            self._paths[path_id] = path
+            self._names[path_id] = name
+            self._folders[path_id] = is_dir
+        else:
+            path_id = len(self._paths)
+            self._paths.append(path)
+            self._names.append(name)
+            self._folders.append(is_dir)
+
+        self._ids[path] = path_id
+        for trigram in _trigrams(name):
+            self._postings.setdefault(trigram, set()).add(path_id)
+
+    def remove(self, path: str) -> None:
+        path_id: int | None = self._ids.pop(path, None)
+        if path_id is None:
+            return
+
+        for trigram in _trigrams(self._names[path_id]):
+            posting: set[int] | None = self._postings.get(trigram)
+            if posting is None:
+                continue
+
+            posting.discard(path_id)
+            if not posting:
+                del self._postings[trigram]
+
+        self._paths[path_id] = None
+        self._names[path_id] = ""
+        self._free.append(path_id)
+
+    def remove_tree(self, directory: str) -> None:
+        """Removes `directory` and everything indexed underneath it."""
+        prefix: str = directory.rstrip(os.sep) + os.sep
+        for path in [x for x in self._ids if x.startswith(prefix)]:
+            self.remove(path)
+
+        self.remove(directory)
+
+    def search(self, query: str) -> Iterator[tuple[str, bool]]:
+        """
+        Yields each path whose name matches `query`, and whether it is a
+        folder.
+
+        A query containing `*`, `?` or `[` is treated as a glob matched
+        against the whole name, otherwise as a substring. Both are case
+        insensitive.
+        """
+        return self.matches(query, self.candidates(query))
+
+    def candidates(self, query: str) -> Iterable[int]:
+        """
+        The ids of the paths that could match `query`, copied so they
+        can be checked with `matches` after the index has moved on.
+        """
+        query = query.lower()
+
+        if _GLOB_CHARACTERS.search(query):
+            # A [...] class matches one character that is not literally
+            # in the name, so it is dropped before looking for literals.
+            literals: list[str] = [
+                x for x in _GLOB_CHARACTERS.split(_GLOB_CLASSES.sub("*", query))
+                if len(x) >= 3
+            ]
+            return self._candidates(literals)
+
+        return self._candidates([query] if len(query) >= 3 else [])
+
+    def matches(self, query: str, candidates: Iterable[int]) -> Iterator[tuple[str, bool]]:
+        """
+        Checks `candidates` against `query`. This only reads the index,
+        so it can run without holding the lock that guards changes: a
+        path removed since is skipped, and every name is checked again.
+        """
+        query = query.lower()
+        matcher: Callable[[str], bool]
+
+        if _GLOB_CHARACTERS.search(query):
+            pattern: re.Pattern[str] = re.compile(fnmatch.translate(query))
+            matcher = lambda name: pattern.match(name) is not None
+        else:
+            matcher = lambda name: query in name
+
+        for path_id in candidates:
+            path: str | None = self._paths[path_id]
+            if path is None:
+                continue
+
+            if matcher(os.path.basename(path.rstrip(os.sep)).lower()):
+                yield (path, self._folders[path_id])
+
+    def _candidates(self, literals: list[str]) -> Iterable[int]:
+        trigrams: set[str] = set()
+        for literal in literals:
+            trigrams |= _trigrams(literal)
+
+        if not trigrams:
+            return range(len(self._paths))
+
+        postings: list[set[int]] = sorted(
+            (self._postings.get(trigram, set()) for trigram in trigrams),
+            key=len
+        )
+        return sorted(postings[0].intersection(*postings[1:]))
+
+    def __contains__(self, path: str) -> bool:
+        return path in self._ids
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+
+class SearchIndex:
+    """
+    Builds and maintains a `TrigramIndex` over a set of root folders.
+
+    The index is built on a background thread and then refreshed every
+    `refresh_interval` seconds. A refresh only lists directories whose
+    mtime has changed since they were last seen, so keeping a large
+    tree up to date costs one `stat` per directory. Searches also run on
+    a background thread and stream their results back in chunks through
+    `App.call_soon`; starting a new search cancels the last one.
+    """
+    def __init__(
+        self,
+        app: gui.App,
+        roots: list[Path],
+        on_progress: Callable[[int, bool], Any] | None = None,
+        refresh_interval: float = 300.0
+    ) -> None:
+        self._app: gui.App = app
+        self._roots: list[str] = [root.exact_path for root in roots]
+        self._on_progress: Callable[[int, bool], Any] | None = on_progress
+        self._refresh_interval: float = refresh_interval
+
+        self._index: TrigramIndex = TrigramIndex()
+        self._lock: threading.Lock = threading.Lock()
+        self._directories: dict[str, tuple[int, set[str], set[str]]] = {}
+        self._ready: bool = False
+        self._stop: threading.Event = threading.Event()
+        self._search_cancel: threading.Event | None = None
+
+        self._thread: threading.Thread = threading.Thread(
+            target=self._worker,
+            daemon=True
+        )
+        self._thread.start()
+
+    def search(
+        self,
+        query: str,
+        on_chunk: Callable[[list[tuple[str, bool]]], Any],
+        on_done: Callable[[int], Any] | None = None,
+        chunk_size: int = 500,
+        limit: int = 100_000
+    ) -> None:
+        """
+        Starts a search, cancelling any search still in progress.
+
+        Args:
+            query (str): A substring, or a glob if it contains `*`, `?`
+                or `[`.
+            on_chunk (Callable[[list[tuple[str, bool]]], Any]): Called
+                on the Tk thread with each chunk of matches, as
+                (path, is_dir) pairs.
+            on_done (Callable[[int], Any] | None): Called on the Tk
+                thread with the number of matches once finished.
+            chunk_size (int): The most paths to deliver at once.
+            limit (int): The most matches to return.
+        """
+        self.cancel_search()
+        cancel_event: threading.Event = threading.Event()
+        self._search_cancel = cancel_event
+
+        threading.Thread(
+            target=self._search_worker,
+            args=(query, cancel_event, on_chunk, on_done, chunk_size, limit),
+            daemon=True
+        ).start()
+
+    def cancel_search(self) -> None:
+        if self._search_cancel is not None:
+            self._search_cancel.set()
+            self._search_cancel = None
+
+    def apply_event(self, directory: Path, name: str, new_name: str = "") -> None:
+        """
+        Updates the index for a change seen by the directory watcher,
+        without waiting for the next refresh.
+        """
+        old_path: str = os.path.join(directory.exact_path, name)
+        if not any(
+            old_path == root or old_path.startswith(root.rstrip(os.sep) + os.sep)
+            for root in self._roots
+        ):
+            return
+
+        # Stat before taking the lock, so the Tk thread never waits on
+        # the disk while holding it.
+        added: list[tuple[str, bool]] = []
+        for added_name in (new_name, name if not new_name else ""):
+            path: str = os.path.join(directory.exact_path, added_name)
+            if added_name and os.path.lexists(path):
+                added.append((path, os.path.isdir(path)))
+
+        with self._lock:
+            self._index.remove_tree(old_path)
+            self._forget_directory(old_path)
+
+            for path, is_dir in added:
+                self._index.add(path, is_dir)
+
+    def stop(self) -> None:
+        self._stop.set()
+        self.cancel_search()
+
+    @property
+    def ready(self) -> bool:
+        """Whether the first full build of the index has finished."""
+        return self._ready
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def _worker(self) -> None:
+        while not self._stop.is_set():
+            started: float = time.perf_counter()
+            count: int = self._refresh()
+
+            if not self._ready:
+                self._ready = True
+                errors.info(
+                    None,
+                    "Search index",
+                    "Indexed %d items in %.2fs",
+                    count,
+                    time.perf_counter() - started
+                )
+
+            self._report_progress(count, True)
+            self._stop.wait(self._refresh_interval)
+
+    def _refresh(self) -> int:
+        stack: list[str] = [root for root in self._roots if os.path.isdir(root)]
+        seen: set[str] = set()
+        count: int = 0
+
+        while stack and not self._stop.is_set():
+            directory: str = stack.pop()
+            if directory in seen:
+                continue
+            seen.add(directory)
+
+            try:
+                mtime: int = os.stat(directory).st_mtime_ns
+            except OSError:
+                with self._lock:
+                    self._index.remove_tree(directory)
+                    self._forget_directory(directory)
+                continue
+
+            known: tuple[int, set[str], set[str]] | None = (
+                self._directories.get(directory)
+            )
+            if known is not None and known[0] == mtime:
+                stack.extend(known[2])
+                continue
+
+            children, subdirectories = self._list(directory)
+            count += len(children)
+
+            with self._lock:
+                if known is not None:
+                    for path in known[1] - children:
+                        self._index.remove_tree(path)
+                        self._forget_directory(path)
+
+                for path in children:
+                    self._index.add(path, path in subdirectories)
+
+                self._directories[directory] = (mtime, children, subdirectories)
+
+            stack.extend(subdirectories)
+
+            if count and count % 10_000 < len(children):
+                self._report_progress(len(self._index), False)
+
+        return len(self._index)
+
+    def _list(self, directory: str) -> tuple[set[str], set[str]]:
+        paths: set[str] = set()
+        subdirectories: set[str] = set()
+
+        try:
+            with os.scandir(directory) as iterator:
+                for entry in iterator:
+                    paths.add(entry.path)
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            subdirectories.add(entry.path)
+                    except OSError:
+                        continue
+        except OSError:
+            pass
+
+        return (paths, subdirectories)
+
+    def _forget_directory(self, directory: str) -> None:
+        prefix: str = directory.rstrip(os.sep) + os.sep
+        for path in [x for x in self._directories if x.startswith(prefix)]:
+            del self._directories[path]
+
+        self._directories.pop(directory, None)
+
+    def _report_progress(self, count: int, finished: bool) -> None:
+        if self._on_progress is not None:
+            self._app.call_soon(self._on_progress, count, finished)
+
+    def _search_worker(
+        self,
+        query: str,
+        cancel_event: threading.Event,
+        on_chunk: Callable[[list[tuple[str, bool]]], Any],
+        on_done: Callable[[int], Any] | None,
+        chunk_size: int,
+        limit: int
+    ) -> None:
+        # Only the candidate ids are taken under the lock; checking them
+        # can take a while on a large index, and watcher events would
+        # otherwise wait for it on the Tk thread.
+        with self._lock:
+            candidates: Iterable[int] = self._index.candidates(query)
+
+        # Chunks are posted as they fill, or after `_STREAM_INTERVAL`
+        # seconds for sparse matches, so results appear while the rest
+        # of the index is still being checked.
+        chunk: list[tuple[str, bool]] = []
+        count: int = 0
+        last_delivery: float = time.perf_counter()
+        for match in self._index.matches(query, candidates):
+            if cancel_event.is_set():
+                return
+
+            chunk.append(match)
+            count += 1
+            if count >= limit:
+                break
+
+            if len(chunk) >= chunk_size or (
+                time.perf_counter() - last_delivery >= _STREAM_INTERVAL
+            ):
+                self._app.call_soon(self._deliver, cancel_event, on_chunk, chunk)
+                chunk = []
+                last_delivery = time.perf_counter()
+
+        if chunk and not cancel_event.is_set():
+            self._app.call_soon(self._deliver, cancel_event, on_chunk, chunk)
+
+        if on_done is not None:
+            self._app.call_soon(self._deliver, cancel_event, on_done, count)
+
+    def _deliver(
+        self,
+        cancel_event: threading.Event,
+        callback: Callable[..., Any],
+        *args: Any
+    ) -> None:
+        if not cancel_event.is_set():
+            callback(*args)
+
+
+def item_for_result(path: str, is_dir: bool) -> gui.ListItem:
+    """Builds a list row for a search result."""
+    return gui.ListItem(
+        path,
+        "folder" if is_dir else "file",
+        directory=Path(os.path.dirname(path.rstrip(os.sep)))
+    )
@@ -4,6 +4,7 @@ from typing import Any, cast
 
 import errors
 from files import fix_path, Path
+import profiling
 
 
 
@@ -32,6 +33,7 @@ class File_Association:
 class File_Extensions:
     def __init__(self) -> None:
         self.__name__: str = "File_Extensions"
+        self._categories: dict[str, list[str]] = {}
         return None
     
     def parse_dict(self, obj: dict[str, str|list[str]]) -> None:
@@ -42,11 +44,19 @@ class File_Extensions:
                 string_value = os.path.join(*value)
 
             self.__setattr__(key, string_value)
+            self._categories[key] = (
+                list(value) if isinstance(value, list) else [value]
+            )
+
+    @property
+    def categories(self) -> dict[str, list[str]]:
+        """Each category and its extensions, as listed in the settings."""
+        return self._categories
 
     def __str__(self) -> str:
         result: str = ""
         for key, value in self.__dict__.items():
-            if key == "__name__": continue
+            if key in ("__name__", "_categories"): continue
             
             result += f"@{self.__name__} - {key}: {value}\n"
 
@@ -60,6 +70,7 @@ class AI_Rules:
         self.file_extensions: File_Extensions = File_Extensions()
         self._global_folders: list[str] = []
         self.sort_on_close: bool = False
+        self.content_sniffing: bool = False
 
     @property
     def global_folders(self) -> list[str]:
@@ -112,26 +123,36 @@ class Settings:
         self.file_association: File_Association = File_Association()
         self.global_ai_rules: AI_Rules = AI_Rules()
         self.local_ai_rules: AI_Rules = AI_Rules()
+        self.metadata_index: bool = False
+        self.copy_workers: int = 8
+        self.log_level: str = "info"
 
         del self.local_ai_rules.global_folders
         del self.local_ai_rules.sort_on_close
 
+    @profiling.profiled("settings parse")
     def parse_settings(self, obj: dict[str, Any]) -> None:
         self.color_mode = obj.get("colorMode", self.color_mode)
         self.color_theme = obj.get("colorTheme", self.color_theme)
         self.start_directory = obj.get("startDirectory", self.start_directory)
         self.recent_files = obj.get("recentFiles", self.recent_files)
         self.file_association.parse_dict(obj.get("fileAssociation", {}))
+        self.metadata_index = bool(obj.get("metadataIndex", self.metadata_index))
+        self.copy_workers = max(1, int(obj.get("copyWorkers", self.copy_workers)))
+        self.log_level = str(obj.get("logLevel", self.log_level)).lower()
         
         global_ai_rules = obj.get("globalAIRules", {})
         global_file_extensions = global_ai_rules.get("fileExtensions", {})
         global_folders = global_ai_rules.get("globalFolders", [])
         global_sort_on_close = global_ai_rules.get("sortOnClose", False)
+        global_content_sniffing = global_ai_rules.get("contentSniffing", False)
 
         local_file_rules = obj.get("localAIRules", {}).get("fileExtensions", []) or global_file_extensions
 
         self.global_ai_rules.global_folders = global_folders
         self.global_ai_rules.sort_on_close = global_sort_on_close
+        self.global_ai_rules.content_sniffing = bool(global_content_sniffing)
+        self.local_ai_rules.content_sniffing = bool(global_content_sniffing)
         self.global_ai_rules.file_extensions.parse_dict(global_file_extensions)
 
         self.local_ai_rules.file_extensions.parse_dict(local_file_rules)
@@ -0,0 +1,819 @@
+from __future__ import annotations
+from concurrent.futures import Future, ThreadPoolExecutor
+import errno
+import json
+import os
+import shutil
+import threading
+import time
+from typing import Any, Callable, Iterable, Iterator
+
+from content_sniff import ContentSniffer, WEAK_MATCHES
+import errors
+import settings
+
+
+class SortMove:
+    """A single file to move into its category folder."""
+    __slots__ = ("source", "target", "category", "size")
+
+    def __init__(self, source: str, target: str, category: str, size: int = 0) -> None:
+        self.source: str = source
+        self.target: str = target
+        self.category: str = category
+        self.size: int = size
+
+    def __repr__(self) -> str:
+        return f"SortMove({self.source!r} -> {self.target!r})"
+
+
+class SortReport:
+    """Running totals for a sort, safe to update from several workers."""
+    __slots__ = (
+        "scanned",
+        "moved",
+        "skipped",
+        "failed",
+        "bytes",
+        "dry_run",
+        "started",
+        "finished",
+        "_lock"
+    )
+
+    def __init__(self, dry_run: bool = False) -> None:
+        self.scanned: int = 0
+        self.moved: int = 0
+        self.skipped: int = 0
+        self.failed: int = 0
+        self.bytes: int = 0
+        self.dry_run: bool = dry_run
+        self.started: float = time.perf_counter()
+        self.finished: float | None = None
+        self._lock: threading.Lock = threading.Lock()
+
+    def add(self, moved: int = 0, failed: int = 0, size: int = 0) -> None:
+        with self._lock:
+            self.moved += moved
+            self.failed += failed
+            self.bytes += size
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished or time.perf_counter()) - self.started
+
+    @property
+    def files_per_second(self) -> float:
+        return self.moved / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def bytes_per_second(self) -> float:
+        return self.bytes / self.elapsed if self.elapsed else 0.0
+
+    def __str__(self) -> str:
+        action: str = "Would move" if self.dry_run else "Moved"
+        return (
+            f"{action} {self.moved} of {self.scanned} files "
+            + f"({self.skipped} unsorted, {self.failed} failed) in "
+            + f"{self.elapsed:.2f}s, {self.files_per_second:.0f} files/s"
+        )
+
+
+class ExtensionClassifier:
+    """
+    Maps file names to categories using the user's extension rules.
+
+    The rules are compiled once into a dict keyed by lowercase suffix
+    chains, such as "gz" and "tar.gz". A name is classified by trying
+    its longest suffix chain first, so "backup.tar.gz" matches "tar.gz"
+    before "gz". That is at most one lookup per suffix depth, however
+    many rules there are. An extension listed under several categories
+    goes to the first one.
+    """
+    def __init__(self, file_extensions: settings.File_Extensions) -> None:
+        self._table: dict[str, str] = {}
+        for category, extensions in file_extensions.categories.items():
+            for extension in extensions:
+                suffix: str = extension.lower().strip().strip(".")
+                if suffix:
+                    self._table.setdefault(suffix, category)
+
+        self._depth: int = max(
+            (suffix.count(".") + 1 for suffix in self._table),
+            default=0
+        )
+
+    @classmethod
+    def from_rules(cls, rules: settings.AI_Rules) -> ExtensionClassifier:
+        return cls(rules.file_extensions)
+
+    def classify(self, name: str) -> str | None:
+        """Returns the category for `name`, or None if it has no rule."""
+        parts: list[str] = name.lower().lstrip(".").split(".")
+
+        for depth in range(min(self._depth, len(parts) - 1), 0, -1):
+            category: str | None = self._table.get(".".join(parts[-depth:]))
+            if category is not None:
+                return category
+
+        return None
+
+    def classify_suffix(self, suffix: str) -> str | None:
+        """Returns the category for a bare suffix chain, such as "tar.gz"."""
+        return self._table.get(suffix.lower())
+
+    def classify_content(
+        self,
+        name: str,
+        file_path: str,
+        sniffer: ContentSniffer | None,
+        stats: os.stat_result | None = None
+    ) -> str | None:
+        """
+        Classifies a file by its name, then by its content if `sniffer`
+        is given. A clear content match overrules the extension, so a
+        PNG saved as .txt goes with the images. Weak matches, such as
+        plain text or a bare zip, only fill in for names with no rule.
+        """
+        category: str | None = self.classify(name)
+        if sniffer is None:
+            return category
+
+        sniffed: str | None = sniffer.sniff(file_path, stats)
+        if sniffed is None or (sniffed in WEAK_MATCHES and category is not None):
+            return category
+
+        return self.classify_suffix(sniffed) or category
+
+    def classify_all(self, names: Iterable[str]) -> dict[str, str | None]:
+        """
+        Classifies a whole listing in one pass. Names that share their
+        final extension share the work of looking it up.
+        """
+        table: dict[str, str] = self._table
+        depth: int = self._depth
+        last_suffix: dict[str, str | None] = {}
+        result: dict[str, str | None] = {}
+
+        for name in names:
+            parts: list[str] = name.lower().lstrip(".").split(".")
+            if len(parts) < 2:
+                result[name] = None
+                continue
+
+            if depth < 2 or len(parts) < 3:
+                if parts[-1] not in last_suffix:
+                    last_suffix[parts[-1]] = table.get(parts[-1])
+                result[name] = last_suffix[parts[-1]]
+                continue
+
+            result[name] = self.classify(name)
+
+        return result
+
+    def __len__(self) -> int:
+        return len(self._table)
+
+
+def walk_files(
+    folders: Iterable[str],
+    since: dict[str, float] | None = None
+) -> Iterator[os.DirEntry[str]]:
+    """
+    Yields the files directly inside each folder. Sub-folders, including
+    the category folders from earlier sorts, are left alone.
+
+    With `since`, a folder's files are only yielded if they were
+    modified, created or moved in after its high-water mark.
+    """
+    for folder in folders:
+        mark: float | None = (since or {}).get(folder)
+        try:
+            with os.scandir(folder) as iterator:
+                for entry in iterator:
+                    try:
+                        if not entry.is_file(follow_symlinks=False):
+                            continue
+
+                        if mark is not None:
+                            stats: os.stat_result = entry.stat(follow_symlinks=False)
+                            if max(stats.st_mtime, stats.st_ctime) < mark:
+                                continue
+                    except OSError:
+                        continue
+
+                    yield entry
+        except OSError as e:
+            errors.warn(None, "Sort failed", f"{folder!r} could not be read: {e}")
+
+
+def classify(
+    entries: Iterable[os.DirEntry[str]],
+    classifier: ExtensionClassifier,
+    report: SortReport,
+    sniffer: ContentSniffer | None = None
+) -> Iterator[SortMove]:
+    """
+    Turns each file with a known extension, or with recognised content
+    when `sniffer` is given, into a `SortMove`.
+    """
+    for entry in entries:
+        report.scanned += 1
+        try:
+            stats: os.stat_result | None = entry.stat(follow_symlinks=False)
+        except OSError:
+            stats = None
+
+        category: str | None = classifier.classify_content(
+            entry.name,
+            entry.path,
+            sniffer,
+            stats
+        )
+
+        if category is None:
+            report.skipped += 1
+            continue
+
+        size: int = stats.st_size if stats is not None else 0
+
+        yield SortMove(
+            entry.path,
+            os.path.join(os.path.dirname(entry.path), category, entry.name),
+            category,
+            size
+        )
+
+
+def batched(moves: Iterable[SortMove], size: int) -> Iterator[list[SortMove]]:
+    batch: list[SortMove] = []
+    for move in moves:
+        batch.append(move)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+
+    if batch:
+        yield batch
+
+
+def unique_target(target: str) -> str:
+    """Adds " (n)" before the extension until `target` is free."""
+    if not os.path.lexists(target):
+        return target
+
+    stem, extension = os.path.splitext(target)
+    count: int = 1
+    while os.path.lexists(f"{stem} ({count}){extension}"):
+        count += 1
+
+    return f"{stem} ({count}){extension}"
+
+
+class GlobalSorter:
+    """
+    Sorts the files in the global folders into category sub-folders.
+
+    The work is a pipeline of generators: the folders are walked, each
+    file is classified by an `ExtensionClassifier` compiled once from
+    the user's extension rules, and the moves are grouped into batches
+    for a pool of worker threads. Only a few batches are in flight at a
+    time, so memory stays flat however many files there are. With
+    `dry_run`, the moves are counted and logged but nothing is touched.
+    `since` maps folders to high-water marks, as kept by `SortState`.
+    With a `ContentSniffer`, files are also classified by their content.
+    """
+    def __init__(
+        self,
+        rules: settings.AI_Rules,
+        max_workers: int = 4,
+        batch_size: int = 256,
+        dry_run: bool = False,
+        on_progress: Callable[[SortReport], Any] | None = None,
+        since: dict[str, float] | None = None,
+        sniffer: ContentSniffer | None = None
+    ) -> None:
+        self._folders: list[str] = list(rules.global_folders)
+        self._since: dict[str, float] | None = since
+        self._sniffer: ContentSniffer | None = sniffer
+        self._classifier: ExtensionClassifier = ExtensionClassifier.from_rules(rules)
+        self._max_workers: int = max_workers
+        self._batch_size: int = batch_size
+        self._dry_run: bool = dry_run
+        self._on_progress: Callable[[SortReport], Any] | None = on_progress
+        self._created: set[str] = set()
+        self._created_lock: threading.Lock = threading.Lock()
+        # Whether a source folder and a category folder share a device,
+        # so files can be renamed rather than copied between them.
+        self._same_device: dict[tuple[str, str], bool] = {}
+
+    def run(self) -> SortReport:
+        """Sorts every global folder, blocking until it has finished."""
+        report: SortReport = SortReport(self._dry_run)
+        moves: Iterator[SortMove] = classify(
+            walk_files(self._folders, self._since),
+            self._classifier,
+            report,
+            self._sniffer
+        )
+
+        with ThreadPoolExecutor(
+            max_workers=self._max_workers,
+            thread_name_prefix="global-sorter"
+        ) as pool:
+            in_flight: list[Future[None]] = []
+
+            for batch in batched(moves, self._batch_size):
+                in_flight.append(pool.submit(self._move_batch, batch, report))
+
+                if len(in_flight) >= self._max_workers * 2:
+                    in_flight.pop(0).result()
+                    self._report_progress(report)
+
+            for future in in_flight:
+                future.result()
+
+        report.finished = time.perf_counter()
+        if self._sniffer is not None:
+            self._sniffer.save()
+
+        self._report_progress(report)
+        errors.info(None, "Global sorter", str(report))
+        return report
+
+    def _move_batch(self, batch: list[SortMove], report: SortReport) -> None:
+        moved: int = 0
+        failed: int = 0
+        size: int = 0
+
+        for move in batch:
+            if self._dry_run:
+                errors.info(None, "Global sorter", "Would move %r", move)
+                moved += 1
+                size += move.size
+                continue
+
+            try:
+                folder: str = os.path.dirname(move.target)
+                self._ensure_folder(folder)
+                same_device: bool = self._on_same_device(
+                    os.path.dirname(move.source),
+                    folder
+                )
+                while True:
+                    try:
+                        move_no_replace(
+                            move.source,
+                            unique_target(move.target),
+                            same_device
+                        )
+                    except FileExistsError:
+                        continue
+                    break
+            except OSError as e:
+                errors.warn(None, "Sort failed", f"{move!r}: {e}")
+                failed += 1
+                continue
+
+            moved += 1
+            size += move.size
+
+        report.add(moved, failed, size)
+
+    def _ensure_folder(self, folder: str) -> None:
+        with self._created_lock:
+            if folder in self._created:
+                return
+
+            os.makedirs(folder, exist_ok=True)
+            self._created.add(folder)
+
+    def _on_same_device(self, source_folder: str, folder: str) -> bool:
+        key: tuple[str, str] = (source_folder, folder)
+        with self._created_lock:
+            known: bool | None = self._same_device.get(key)
+
+        if known is None:
+            known = _same_device(source_folder, folder)
+            with self._created_lock:
+                self._same_device[key] = known
+
+        return known
+
+    def _report_progress(self, report: SortReport) -> None:
+        if self._on_progress is not None:
+            self._on_progress(report)
+
+
+class SortState:
+    """
+    The high-water mark of the last finished global sort of each folder,
+    and a lock so only one background sort runs at a time.
+
+    A mark is the time a sort started, so files that arrive while it is
+    running are picked up by the next one.
+    """
+    STALE_LOCK: float = 6 * 60 * 60
+
+    def __init__(self, file_path: str) -> None:
+        self.file_path: str = file_path
+        self.lock_path: str = file_path + ".lock"
+        self.marks: dict[str, float] = {}
+
+    def load(self) -> SortState:
+        try:
+            with open(self.file_path, "r", encoding="utf-8") as f:
+                self.marks = {
+                    folder: float(mark)
+                    for folder, mark in json.load(f).get("marks", {}).items()
+                }
+        except (OSError, ValueError, AttributeError):
+            self.marks = {}
+
+        return self
+
+    def save(self) -> None:
+        temporary_path: str = self.file_path + ".tmp"
+        with open(temporary_path, "w", encoding="utf-8") as f:
+            json.dump({"marks": self.marks}, f)
+
+        os.replace(temporary_path, self.file_path)
+
+    def acquire(self) -> bool:
+        """Takes the lock, unless another sort holds a recent one."""
+        try:
+            if time.time() - os.path.getmtime(self.lock_path) > self.STALE_LOCK:
+                os.remove(self.lock_path)
+        except OSError:
+            pass
+
+        try:
+            os.close(os.open(self.lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        except FileExistsError:
+            return False
+
+        return True
+
+    def release(self) -> None:
+        try:
+            os.remove(self.lock_path)
+        except FileNotFoundError:
+            pass
+
+
+def incremental_sort(
+    rules: settings.AI_Rules,
+    state_path: str,
+    dry_run: bool = False,
+    sniffer: ContentSniffer | None = None
+) -> SortReport | None:
+    """
+    Sorts only the files in the global folders that changed since the
+    last sort, then moves the high-water marks forward. Returns None if
+    another sort is already running.
+    """
+    state: SortState = SortState(state_path).load()
+    if not state.acquire():
+        errors.info(None, "Global sorter", "Another sort is already running")
+        return None
+
+    try:
+        started: float = time.time()
+        report: SortReport = GlobalSorter(
+            rules,
+            dry_run=dry_run,
+            since=state.marks,
+            sniffer=sniffer
+        ).run()
+
+        if not dry_run and not report.failed:
+            state.marks.update({folder: started for folder in rules.global_folders})
+            state.save()
+    finally:
+        state.release()
+
+    return report
+
+
+class SortJournal:
+    """
+    A JSON lines record of a folder sort, kept inside the folder.
+
+    The full plan, and the folders the sort has to create, are written
+    and synced before anything moves, followed by a line for every batch
+    of finished moves and for every move given a new target. If the sort
+    is cut short, the journal has everything needed to finish it or to put
+    every file back where it was.
+    """
+    FILE_NAME: str = ".elysium-sort.journal"
+
+    def __init__(self, directory: str) -> None:
+        self.path: str = os.path.join(directory, self.FILE_NAME)
+        self.moves: list[SortMove] = []
+        self.folders: list[str] = []
+        self.done: set[int] = set()
+        self.complete: bool = False
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def write_plan(self, moves: list[SortMove], folders: list[str]) -> None:
+        self.moves = moves
+        self.folders = folders
+
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"folders": folders}) + "\n")
+            for move in moves:
+                f.write(json.dumps(
+                    {"source": move.source, "target": move.target}
+                ) + "\n")
+            f.write(json.dumps({"begin": len(moves)}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def record_done(self, indices: list[int]) -> None:
+        self.done.update(indices)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"done": indices}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def record_target(self, index: int, target: str) -> None:
+        """Records that move `index` goes to `target` instead of its plan."""
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"retarget": index, "target": target}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def load(self) -> None:
+        """
+        Reads the journal back. A plan that was never fully written is
+        treated as empty, since nothing moves before it is.
+        """
+        moves: list[SortMove] = []
+        begun: bool = False
+
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record: dict[str, Any] = json.loads(line)
+                except json.JSONDecodeError:
+                    break
+
+                if "folders" in record:
+                    self.folders = record["folders"]
+                elif "source" in record:
+                    moves.append(SortMove(record["source"], record["target"], ""))
+                elif "begin" in record:
+                    begun = True
+                elif "done" in record:
+                    self.done.update(record["done"])
+                elif "retarget" in record and record["retarget"] < len(moves):
+                    moves[record["retarget"]].target = record["target"]
+
+        self.moves = moves if begun else []
+
+    def remove(self) -> None:
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class FolderSorter:
+    """
+    Sorts the files in one folder into category sub-folders, using the
+    local extension rules.
+
+    A full move plan is worked out before anything is touched, including
+    the names of any files that would clash. The category folders are
+    then created once, and files are moved with `move_no_replace`, which
+    only updates directory entries when the source and target share a
+    device and never replaces an existing file. A target that has been
+    taken since the plan was made gets the next " (n)" name instead.
+    Progress is journalled in batches, so an interrupted sort can be
+    resumed or rolled back.
+    """
+    def __init__(
+        self,
+        directory: str,
+        rules: settings.AI_Rules,
+        batch_size: int = 500,
+        on_progress: Callable[[SortReport], Any] | None = None,
+        sniffer: ContentSniffer | None = None
+    ) -> None:
+        self._directory: str = directory
+        self._sniffer: ContentSniffer | None = sniffer
+        self._classifier: ExtensionClassifier = ExtensionClassifier.from_rules(rules)
+        self._batch_size: int = batch_size
+        self._on_progress: Callable[[SortReport], Any] | None = on_progress
+        self.journal: SortJournal = SortJournal(directory)
+
+    @property
+    def interrupted(self) -> bool:
+        """Whether an earlier sort of this folder did not finish."""
+        return self.journal.exists()
+
+    def plan(self) -> list[SortMove]:
+        """Works out every move the sort would make, without moving anything."""
+        entries: dict[str, os.DirEntry[str]] = {
+            entry.name: entry
+            for entry in walk_files([self._directory])
+            if entry.name != SortJournal.FILE_NAME
+        }
+        categories: dict[str, str | None]
+        if self._sniffer is None:
+            categories = self._classifier.classify_all(entries)
+        else:
+            categories = {
+                name: self._classifier.classify_content(
+                    name,
+                    entry.path,
+                    self._sniffer
+                )
+                for name, entry in entries.items()
+            }
+            self._sniffer.save()
+
+        taken: set[str] = set()
+        moves: list[SortMove] = []
+
+        for name, category in categories.items():
+            if category is None:
+                continue
+
+            target: str = os.path.join(self._directory, category, name)
+            stem, extension = os.path.splitext(target)
+            count: int = 0
+            while target in taken or os.path.lexists(target):
+                count += 1
+                target = f"{stem} ({count}){extension}"
+
+            taken.add(target)
+            try:
+                size: int = entries[name].stat(follow_symlinks=False).st_size
+            except OSError:
+                size = 0
+
+            moves.append(SortMove(entries[name].path, target, category, size))
+
+        return moves
+
+    def run(self) -> SortReport:
+        """Sorts the folder, or finishes an interrupted sort of it."""
+        if self.journal.exists():
+            self.journal.load()
+            moves: list[SortMove] = self.journal.moves
+        else:
+            moves = self.plan()
+            self.journal.write_plan(
+                moves,
+                sorted({
+                    os.path.dirname(move.target) for move in moves
+                    if not os.path.isdir(os.path.dirname(move.target))
+                })
+            )
+
+        report: SortReport = SortReport()
+        report.scanned = len(moves)
+
+        for folder in self.journal.folders:
+            os.makedirs(folder, exist_ok=True)
+
+        same_device: dict[str, bool] = {}
+
+        finished: list[int] = []
+        for index, move in enumerate(moves):
+            if index in self.journal.done:
+                report.skipped += 1
+                continue
+
+            if not os.path.lexists(move.source) and os.path.lexists(move.target):
+                finished.append(index)
+                report.skipped += 1
+            else:
+                folder: str = os.path.dirname(move.target)
+                if folder not in same_device:
+                    same_device[folder] = _same_device(self._directory, folder)
+
+                try:
+                    while True:
+                        if os.path.lexists(move.target):
+                            # Something has taken the planned name since
+                            # the plan was made, so pick the next free one.
+                            move.target = unique_target(move.target)
+                            self.journal.record_target(index, move.target)
+
+                        try:
+                            move_no_replace(
+                                move.source,
+                                move.target,
+                                same_device[folder]
+                            )
+                        except FileExistsError:
+                            continue
+                        break
+                except OSError as e:
+                    errors.warn(None, "Sort failed", f"{move!r}: {e}")
+                    report.add(failed=1)
+                    continue
+
+                finished.append(index)
+                report.add(moved=1, size=move.size)
+
+            if len(finished) >= self._batch_size:
+                self.journal.record_done(finished)
+                finished = []
+                self._report_progress(report)
+
+        if finished:
+            self.journal.record_done(finished)
+
+        if not report.failed:
+            self.journal.remove()
+
+        report.finished = time.perf_counter()
+        self._report_progress(report)
+        errors.info(None, "Folder sorter", str(report))
+        return report
+
+    def rollback(self) -> SortReport:
+        """Moves every file from an interrupted sort back where it was."""
+        report: SortReport = SortReport()
+        if not self.journal.exists():
+            return report
+
+        self.journal.load()
+        report.scanned = len(self.journal.moves)
+
+        for move in reversed(self.journal.moves):
+            if not os.path.lexists(move.target) or os.path.lexists(move.source):
+                report.skipped += 1
+                continue
+
+            try:
+                shutil.move(move.target, move.source)
+            except OSError as e:
+                errors.warn(None, "Rollback failed", f"{move!r}: {e}")
+                report.add(failed=1)
+                continue
+
+            report.add(moved=1)
+
+        for folder in self.journal.folders:
+            try:
+                os.rmdir(folder)
+            except OSError:
+                continue
+
+        if not report.failed:
+            self.journal.remove()
+
+        report.finished = time.perf_counter()
+        errors.info(None, "Folder sorter rollback", str(report))
+        return report
+
+    def _report_progress(self, report: SortReport) -> None:
+        if self._on_progress is not None:
+            self._on_progress(report)
+
+
+def move_no_replace(source: str, target: str, same_device: bool = False) -> None:
+    """
+    Moves the file `source` to `target`, raising `FileExistsError`
+    rather than replacing anything already at `target`.
+
+    Within a device the file is hard linked to `target`, which fails if
+    the name is taken, and then unlinked from `source`, so there is no
+    window for another file to be replaced. File systems without hard
+    links, and moves across devices, check for `target` first instead.
+    """
+    if same_device:
+        try:
+            os.link(source, target, follow_symlinks=False)
+        except FileExistsError:
+            raise
+        except (OSError, NotImplementedError):
+            pass
+        else:
+            try:
+                os.unlink(source)
+            except OSError:
+                os.unlink(target)
+                raise
+            return
+
+    if os.path.lexists(target):
+        raise FileExistsError(errno.EEXIST, "Target already exists", target)
+
+    if same_device:
+        os.rename(source, target)
+    else:
+        shutil.move(source, target)
+
+
+def _same_device(first: str, second: str) -> bool:
+    try:
+        return os.stat(first).st_dev == os.stat(second).st_dev
+    except OSError:
+        return False
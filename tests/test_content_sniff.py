@@ -0,0 +1,27 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from content_sniff import sniff_bytes
+
+
+def test_text_starting_with_a_short_magic_is_text() -> None:
+    assert sniff_bytes(b"BMW service notes\n") == "txt"
+    assert sniff_bytes(b"OTTO,Name\n1,2") == "txt"
+    assert sniff_bytes(b"ID3 tag list\n") == "txt"
+    assert sniff_bytes(b"BZh is the bzip2 magic\n") == "txt"
+    assert sniff_bytes(b"MZ notes\n") == "txt"
+
+
+def test_binary_headers_keep_their_signature() -> None:
+    assert sniff_bytes(b"BM\x36\x00\x0c\x00\x00\x00\x00\x00\x36\x00") == "bmp"
+    assert sniff_bytes(b"ID3\x03\x00\x00\x00\x00\x1f\x76") == "mp3"
+    assert sniff_bytes(b"OTTO\x00\x0b\x00\x80\x00\x03") == "otf"
+    assert sniff_bytes(b"%PDF-1.7\n%\xe2\xe3\xcf\xd3\n") == "pdf"
+
+
+def test_text_formats_are_still_recognised() -> None:
+    assert sniff_bytes(b"{\\rtf1\\ansi hello}") == "rtf"
+    assert sniff_bytes(b"#!/bin/sh\necho hi\n") == "sh"
+    assert sniff_bytes(b"plain text\n") == "txt"
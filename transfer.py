@@ -0,0 +1,511 @@
+from __future__ import annotations
+from concurrent.futures import ThreadPoolExecutor
+import errno
+import os
+import shutil
+import sys
+import threading
+import time
+from typing import Any, Callable
+
+import errors
+import gui
+
+
+class TransferCancelled(Exception):
+    """Raised inside a transfer's worker when it has been cancelled."""
+
+
+class TransferProgress:
+    """A snapshot of how far a transfer has got."""
+    __slots__ = (
+        "source",
+        "destination",
+        "total_bytes",
+        "copied_bytes",
+        "total_files",
+        "copied_files",
+        "started",
+        "finished"
+    )
+
+    def __init__(self, source: str, destination: str) -> None:
+        self.source: str = source
+        self.destination: str = destination
+        self.total_bytes: int = 0
+        self.copied_bytes: int = 0
+        self.total_files: int = 0
+        self.copied_files: int = 0
+        self.started: float = time.perf_counter()
+        self.finished: bool = False
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    @property
+    def bytes_per_second(self) -> float:
+        return self.copied_bytes / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def eta(self) -> float | None:
+        """Seconds left at the current rate, or None before there is a rate."""
+        if not self.bytes_per_second:
+            return None
+
+        return max(0, self.total_bytes - self.copied_bytes) / self.bytes_per_second
+
+    @property
+    def fraction(self) -> float:
+        if not self.total_bytes:
+            return 1.0 if self.finished else 0.0
+
+        return min(1.0, self.copied_bytes / self.total_bytes)
+
+    def copy(self) -> TransferProgress:
+        snapshot: TransferProgress = TransferProgress(self.source, self.destination)
+        for name in self.__slots__:
+            setattr(snapshot, name, getattr(self, name))
+
+        return snapshot
+
+
+class Transfer:
+    """
+    One copy or move, run by a `TransferEngine`.
+
+    Callbacks are run on the Tk thread. `on_done` is given the final
+    progress, and `on_error` the exception that stopped the transfer,
+    which is a `TransferCancelled` if it was cancelled.
+    """
+    def __init__(
+        self,
+        source: str,
+        destination: str,
+        cut: bool,
+        on_progress: Callable[[TransferProgress], Any] | None = None,
+        on_done: Callable[[TransferProgress], Any] | None = None,
+        on_error: Callable[[Exception], Any] | None = None
+    ) -> None:
+        self.source: str = source
+        self.destination: str = destination
+        self.cut: bool = cut
+        self.progress: TransferProgress = TransferProgress(source, destination)
+        self.on_progress: Callable[[TransferProgress], Any] | None = on_progress
+        self.on_done: Callable[[TransferProgress], Any] | None = on_done
+        self.on_error: Callable[[Exception], Any] | None = on_error
+        self._cancel_event: threading.Event = threading.Event()
+        self._lock: threading.Lock = threading.Lock()
+        self._last_report: float = 0.0
+
+    def cancel(self) -> None:
+        self._cancel_event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel_event.is_set()
+
+    def check_cancelled(self) -> None:
+        if self._cancel_event.is_set():
+            raise TransferCancelled(f"{self.source!r} was cancelled")
+
+    def add_bytes(self, count: int) -> None:
+        with self._lock:
+            self.progress.copied_bytes += count
+
+    def add_file(self) -> None:
+        with self._lock:
+            self.progress.copied_files += 1
+
+
+class TransferEngine:
+    """
+    Copies and moves files and folders on worker threads.
+
+    On Linux, file data is copied with `os.copy_file_range` where the
+    kernel supports it, then `os.sendfile`, and only then through a
+    buffer, so large copies stay inside the kernel. Other platforms
+    always use the buffer. A cut within one file system is
+    a single `os.rename`, which is atomic; across file systems it is a
+    copy followed by deleting the source, and the source is only deleted
+    once the copy has finished. Progress, with the transfer rate and
+    ETA, is handed to the Tk thread through `App.call_soon` at most once
+    every `progress_interval` seconds. A cancelled copy removes what it
+    had written of the file it was on, and a folder copy that is
+    cancelled or fails removes the whole partial copy, so it can simply
+    be pasted again.
+
+    Folders are copied by `copytree`, with `copy_workers` files in
+    flight at once for each transfer.
+    """
+    CHUNK_SIZE: int = 8 * 1024 * 1024
+
+    def __init__(
+        self,
+        app: gui.App,
+        max_workers: int = 2,
+        progress_interval: float = 0.2,
+        copy_workers: int = 8
+    ) -> None:
+        self._app: gui.App = app
+        self._copy_workers: int = copy_workers
+        self._pool: ThreadPoolExecutor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix="transfer"
+        )
+        self._progress_interval: float = progress_interval
+        self._transfers: list[Transfer] = []
+
+    def start(self, transfer: Transfer) -> Transfer:
+        self._transfers.append(transfer)
+        self._pool.submit(self._run, transfer)
+        return transfer
+
+    def cancel_all(self) -> None:
+        for transfer in self._transfers:
+            transfer.cancel()
+
+    @property
+    def active(self) -> list[Transfer]:
+        return [x for x in self._transfers if not x.progress.finished]
+
+    def _run(self, transfer: Transfer) -> None:
+        # Set while a folder copy has a partial tree at the destination.
+        partial_tree: bool = False
+        try:
+            if os.path.lexists(transfer.destination) and os.path.isdir(transfer.source):
+                raise FileExistsError(
+                    errno.EEXIST,
+                    "Destination already exists",
+                    transfer.destination
+                )
+
+            if os.path.abspath(transfer.source) == os.path.abspath(transfer.destination):
+                raise shutil.SameFileError(
+                    f"{transfer.source!r} and {transfer.destination!r} are the same file"
+                )
+
+            if transfer.cut and _same_file_system(
+                transfer.source,
+                os.path.dirname(os.path.abspath(transfer.destination))
+            ):
+                self._rename(transfer)
+            else:
+                self._measure(transfer)
+                partial_tree = os.path.isdir(transfer.source)
+                self._copy(transfer)
+                partial_tree = False
+                if transfer.cut:
+                    transfer.check_cancelled()
+                    _remove(transfer.source)
+
+        except Exception as e:
+            transfer.progress.finished = True
+            try:
+                if not isinstance(e, TransferCancelled):
+                    errors.warn(
+                        None,
+                        "Transfer failed",
+                        f"{transfer.source!r} -> {transfer.destination!r}: {e}"
+                    )
+
+                if partial_tree:
+                    # rmtree only ignores OSError; a very deep tree can
+                    # also raise RecursionError.
+                    try:
+                        shutil.rmtree(transfer.destination, ignore_errors=True)
+                    except Exception as cleanup_error:
+                        errors.warn(
+                            None,
+                            "Transfer cleanup failed",
+                            f"{transfer.destination!r} was left behind: {cleanup_error}"
+                        )
+            finally:
+                self._transfers.remove(transfer)
+                if transfer.on_error is not None:
+                    self._app.call_soon(transfer.on_error, e)
+            return
+
+        transfer.progress.finished = True
+        self._transfers.remove(transfer)
+        errors.info(
+            None,
+            "Transfer",
+            "%r -> %r: %d bytes in %.2fs",
+            transfer.source,
+            transfer.destination,
+            transfer.progress.copied_bytes,
+            transfer.progress.elapsed
+        )
+        if transfer.on_done is not None:
+            self._app.call_soon(transfer.on_done, transfer.progress.copy())
+
+    def _rename(self, transfer: Transfer) -> None:
+        if os.path.lexists(transfer.destination):
+            raise FileExistsError(
+                errno.EEXIST,
+                "Destination already exists",
+                transfer.destination
+            )
+
+        transfer.progress.total_files = 1
+        os.rename(transfer.source, transfer.destination)
+        transfer.progress.copied_files = 1
+
+    def _measure(self, transfer: Transfer) -> None:
+        """Totals up the files and bytes to copy, for the progress and ETA."""
+        if not os.path.isdir(transfer.source):
+            transfer.progress.total_files = 1
+            transfer.progress.total_bytes = os.path.getsize(transfer.source)
+            return
+
+        stack: list[str] = [transfer.source]
+        while stack:
+            transfer.check_cancelled()
+            with os.scandir(stack.pop()) as iterator:
+                for entry in iterator:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                        continue
+
+                    transfer.progress.total_files += 1
+                    try:
+                        transfer.progress.total_bytes += entry.stat(
+                            follow_symlinks=False
+                        ).st_size
+                    except OSError:
+                        continue
+
+    def _copy(self, transfer: Transfer) -> None:
+        if not os.path.isdir(transfer.source):
+            self.copy_file(transfer, transfer.source, transfer.destination)
+            return
+
+        copytree(
+            transfer.source,
+            transfer.destination,
+            max_workers=self._copy_workers,
+            copy_file=lambda source, destination: self.copy_file(
+                transfer,
+                source,
+                destination
+            ),
+            check_cancelled=transfer.check_cancelled
+        )
+
+    def copy_file(self, transfer: Transfer, source: str, destination: str) -> None:
+        """Copies one file's data, permissions and times, checking for cancel."""
+        transfer.check_cancelled()
+
+        if os.path.islink(source):
+            if os.path.lexists(destination):
+                os.remove(destination)
+            os.symlink(os.readlink(source), destination)
+            transfer.add_file()
+            return
+
+        try:
+            with open(source, "rb") as source_file, open(destination, "wb") as target_file:
+                self._copy_data(transfer, source_file.fileno(), target_file.fileno())
+        except TransferCancelled:
+            _remove(destination)
+            raise
+
+        shutil.copystat(source, destination)
+        transfer.add_file()
+        self._report(transfer)
+
+    def _copy_data(self, transfer: Transfer, source: int, destination: int) -> None:
+        for copy in _ZERO_COPY:
+            try:
+                while True:
+                    transfer.check_cancelled()
+                    copied: int = copy(source, destination, self.CHUNK_SIZE)
+                    if copied == 0:
+                        return
+
+                    transfer.add_bytes(copied)
+                    self._report(transfer)
+            except (AttributeError, OSError) as e:
+                if isinstance(e, OSError) and e.errno not in _UNSUPPORTED:
+                    raise
+
+                # Only fall back if nothing has been written yet.
+                if os.lseek(destination, 0, os.SEEK_CUR) != 0:
+                    raise
+
+        while True:
+            transfer.check_cancelled()
+            data: bytes = os.read(source, 1024 * 1024)
+            if not data:
+                return
+
+            os.write(destination, data)
+            transfer.add_bytes(len(data))
+            self._report(transfer)
+
+    def _report(self, transfer: Transfer) -> None:
+        if transfer.on_progress is None:
+            return
+
+        now: float = time.perf_counter()
+        if now - transfer._last_report < self._progress_interval:
+            return
+
+        transfer._last_report = now
+        self._app.call_soon(transfer.on_progress, transfer.progress.copy())
+
+
+_UNSUPPORTED: frozenset[int | None] = frozenset({
+    errno.EXDEV,
+    errno.ENOSYS,
+    errno.EINVAL,
+    errno.EOPNOTSUPP,
+    errno.EBADF,
+    errno.ENOTSOCK,
+    getattr(errno, "ENOTSUP", errno.EOPNOTSUPP),
+})
+
+
+def _copy_file_range(source: int, destination: int, count: int) -> int:
+    return os.copy_file_range(source, destination, count) #type: ignore
+
+
+def _sendfile(source: int, destination: int, count: int) -> int:
+    return os.sendfile(destination, source, None, count) #type: ignore
+
+
+def copytree(
+    source: str,
+    destination: str,
+    max_workers: int = 8,
+    copy_file: Callable[[str, str], Any] | None = None,
+    check_cancelled: Callable[[], None] | None = None,
+    batch_size: int = 64
+) -> int:
+    """
+    Copies the folder `source` to `destination`, which must not exist,
+    copying many files at once.
+
+    The whole tree is listed before anything is created, so copying a
+    folder into one of its own subfolders copies it once, as
+    `shutil.copytree` does, rather than walking into the copy. Every
+    folder is then created up front, so the workers never race each
+    other to create a parent. Files are then copied in
+    batches of `batch_size` on a pool of `max_workers` threads, which
+    hides the per-file latency that dominates trees of small files, most
+    of all on network mounts. Symlinks are copied as links. Folder
+    permissions and times are copied last, deepest first, so adding
+    files does not change them again.
+
+    Args:
+        source (str): The folder to copy.
+        destination (str): Where to create the copy.
+        max_workers (int): How many files to copy at once.
+        copy_file (Callable[[str, str], Any] | None): Copies one file or
+            link and its metadata. Defaults to `shutil.copy2`.
+        check_cancelled (Callable[[], None] | None): Called between
+            files, and expected to raise to stop the copy.
+        batch_size (int): How many files each task copies.
+
+    Returns:
+        int: How many files and links were copied.
+    """
+    copy_one: Callable[[str, str], Any] = copy_file or (
+        lambda source, destination: shutil.copy2(
+            source,
+            destination,
+            follow_symlinks=False
+        )
+    )
+    directories: list[tuple[str, str]] = [(source, destination)]
+    file_pairs: list[tuple[str, str]] = []
+
+    position: int = 0
+    while position < len(directories):
+        source_directory, target_directory = directories[position]
+        position += 1
+        if check_cancelled is not None:
+            check_cancelled()
+
+        with os.scandir(source_directory) as iterator:
+            for entry in iterator:
+                target: str = os.path.join(target_directory, entry.name)
+                if entry.is_dir(follow_symlinks=False):
+                    directories.append((entry.path, target))
+                else:
+                    file_pairs.append((entry.path, target))
+
+    os.makedirs(destination)
+    for _, target_directory in directories[1:]:
+        os.mkdir(target_directory)
+
+    stop: threading.Event = threading.Event()
+
+    def copy_batch(batch: list[tuple[str, str]]) -> None:
+        for source_file, target_file in batch:
+            if stop.is_set():
+                return
+            if check_cancelled is not None:
+                check_cancelled()
+            copy_one(source_file, target_file)
+
+    with ThreadPoolExecutor(
+        max_workers=max(1, max_workers),
+        thread_name_prefix="copytree"
+    ) as pool:
+        futures = [
+            pool.submit(copy_batch, file_pairs[i:i + batch_size])
+            for i in range(0, len(file_pairs), batch_size)
+        ]
+        try:
+            for future in futures:
+                future.result()
+        except BaseException:
+            stop.set()
+            for future in futures:
+                future.cancel()
+            raise
+
+    for source_directory, target_directory in reversed(directories):
+        shutil.copystat(source_directory, target_directory)
+
+    return len(file_pairs)
+
+
+# Only Linux can copy_file_range or sendfile into a regular file;
+# elsewhere, such as macOS, sendfile needs a socket to write to.
+_ZERO_COPY: tuple[Callable[[int, int, int], int], ...] = (
+    (_copy_file_range, _sendfile) if sys.platform.startswith("linux") else ()
+)
+
+
+def _same_file_system(first: str, second: str) -> bool:
+    try:
+        return os.stat(first, follow_symlinks=False).st_dev == os.stat(second).st_dev
+    except OSError:
+        return False
+
+
+def _remove(path: str) -> None:
+    if os.path.isdir(path) and not os.path.islink(path):
+        shutil.rmtree(path)
+    else:
+        os.remove(path)
+
+
+def describe(progress: TransferProgress) -> str:
+    """A short status line, such as "42% - 120.00 MB/s - 12s left"."""
+    eta: float | None = progress.eta
+    rate: str = _format_rate(progress.bytes_per_second)
+    left: str = f" - {eta:.0f}s left" if eta is not None else ""
+    return f"{progress.fraction * 100:.0f}% - {rate}{left}"
+
+
+def _format_rate(rate: float) -> str:
+    units: list[str] = ["B/s", "KB/s", "MB/s", "GB/s"]
+    for unit in units:
+        if rate < 1024:
+            return f"{rate:.2f} {unit}"
+        rate /= 1024
+    return f"{rate:.2f} {units[-1]}"
@@ -0,0 +1,451 @@
+from __future__ import annotations
+import abc
+from collections import OrderedDict
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import threading
+import time
+from typing import Any, Callable
+
+import errors
+import files
+from files import Path
+import gui
+import utils
+
+
+class WatchEvent:
+    """
+    A single change inside a watched directory.
+
+    `kind` is one of "created", "deleted", "renamed", "modified", "gone"
+    or "rescan". "modified" means an item's content or attributes
+    changed in place, without its name changing. "gone" means the watched directory itself was removed or
+    moved away. "rescan" means changes may have been missed, so any
+    cached listing of the directory can no longer be trusted.
+    """
+    __slots__ = ("kind", "directory", "name", "new_name", "entry")
+
+    def __init__(
+        self,
+        kind: str,
+        directory: Path,
+        name: str = "",
+        new_name: str = "",
+        entry: files.Entry | None = None
+    ) -> None:
+        self.kind: str = kind
+        self.directory: Path = directory
+        self.name: str = name
+        self.new_name: str = new_name
+        self.entry: files.Entry | None = entry
+
+    def __repr__(self) -> str:
+        return (
+            f"WatchEvent({self.kind!r}, {self.directory!r}, "
+            + f"{self.name!r}, {self.new_name!r})"
+        )
+
+
+class _Backend(abc.ABC):
+    """The interface shared by the inotify and polling backends."""
+    @abc.abstractmethod
+    def add(self, directory: Path) -> None:
+        ...
+
+    @abc.abstractmethod
+    def remove(self, directory: Path) -> None:
+        ...
+
+    @abc.abstractmethod
+    def read(self, timeout: float) -> list[WatchEvent]:
+        """Waits up to `timeout` seconds and returns any new events."""
+
+    def close(self) -> None:
+        return None
+
+
+class InotifyBackend(_Backend):
+    """
+    Watches directories with the Linux inotify API, through libc.
+
+    Writes and attribute changes are reported as "modified", once per
+    item for each batch read, however many writes it saw.
+    """
+    IN_MODIFY: int = 0x00000002
+    IN_ATTRIB: int = 0x00000004
+    IN_CLOSE_WRITE: int = 0x00000008
+    IN_MOVED_FROM: int = 0x00000040
+    IN_MOVED_TO: int = 0x00000080
+    IN_CREATE: int = 0x00000100
+    IN_DELETE: int = 0x00000200
+    IN_DELETE_SELF: int = 0x00000400
+    IN_MOVE_SELF: int = 0x00000800
+    IN_Q_OVERFLOW: int = 0x00004000
+    IN_IGNORED: int = 0x00008000
+    IN_ISDIR: int = 0x40000000
+    IN_ONLYDIR: int = 0x01000000
+    IN_NONBLOCK: int = 0o4000
+    IN_CLOEXEC: int = 0o2000000
+
+    WATCH_MASK: int = (
+        IN_CREATE
+        | IN_DELETE
+        | IN_MOVED_FROM
+        | IN_MOVED_TO
+        | IN_DELETE_SELF
+        | IN_MOVE_SELF
+        | IN_MODIFY
+        | IN_ATTRIB
+        | IN_CLOSE_WRITE
+        | IN_ONLYDIR
+    )
+    _EVENT_HEADER: struct.Struct = struct.Struct("iIII")
+
+    def __init__(self) -> None:
+        library: str | None = ctypes.util.find_library("c")
+        self._libc: ctypes.CDLL = ctypes.CDLL(library, use_errno=True)
+
+        self._fd: int = self._libc.inotify_init1(
+            self.IN_NONBLOCK | self.IN_CLOEXEC
+        )
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+        self._lock: threading.Lock = threading.Lock()
+        self._descriptors: dict[int, Path] = {}
+        self._directories: dict[Path, int] = {}
+
+    def add(self, directory: Path) -> None:
+        descriptor: int = self._libc.inotify_add_watch(
+            self._fd,
+            os.fsencode(directory.exact_path),
+            self.WATCH_MASK
+        )
+        if descriptor < 0:
+            raise OSError(ctypes.get_errno(), f"Could not watch {directory!r}")
+
+        with self._lock:
+            self._descriptors[descriptor] = directory
+            self._directories[directory] = descriptor
+
+    def remove(self, directory: Path) -> None:
+        with self._lock:
+            descriptor: int | None = self._directories.pop(directory, None)
+            if descriptor is None:
+                return
+
+            self._descriptors.pop(descriptor, None)
+
+        self._libc.inotify_rm_watch(self._fd, descriptor)
+
+    def read(self, timeout: float) -> list[WatchEvent]:
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return []
+
+        try:
+            data: bytes = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+
+        return self._parse(data)
+
+    def close(self) -> None:
+        os.close(self._fd)
+
+    def _parse(self, data: bytes) -> list[WatchEvent]:
+        events: list[WatchEvent] = []
+        moved_from: dict[int, WatchEvent] = {}
+        modified: set[tuple[Path, str]] = set()
+        offset: int = 0
+
+        while offset + self._EVENT_HEADER.size <= len(data):
+            descriptor, mask, cookie, length = self._EVENT_HEADER.unpack_from(
+                data,
+                offset
+            )
+            offset += self._EVENT_HEADER.size
+            name: str = os.fsdecode(
+                data[offset:offset + length].rstrip(b"\0")
+            )
+            offset += length
+
+            if mask & self.IN_Q_OVERFLOW:
+                # The kernel queue filled up and events were dropped, on
+                # no particular watch, so every directory is suspect.
+                with self._lock:
+                    watched: list[Path] = list(self._directories)
+                events.extend(WatchEvent("rescan", x) for x in watched)
+                continue
+
+            with self._lock:
+                directory: Path | None = self._descriptors.get(descriptor)
+
+            if directory is None:
+                continue
+
+            if mask & (self.IN_DELETE_SELF | self.IN_MOVE_SELF | self.IN_IGNORED):
+                events.append(WatchEvent("gone", directory))
+                self.remove(directory)
+                continue
+
+            if mask & self.IN_CREATE:
+                events.append(WatchEvent("created", directory, name))
+
+            elif mask & self.IN_DELETE:
+                events.append(WatchEvent("deleted", directory, name))
+
+            elif mask & self.IN_MOVED_FROM:
+                event: WatchEvent = WatchEvent("deleted", directory, name)
+                moved_from[cookie] = event
+                events.append(event)
+
+            elif mask & self.IN_MOVED_TO:
+                source: WatchEvent | None = moved_from.pop(cookie, None)
+
+                if source is not None and source.directory == directory:
+                    source.kind = "renamed"
+                    source.new_name = name
+                    continue
+
+                events.append(WatchEvent("created", directory, name))
+
+            elif mask & (self.IN_MODIFY | self.IN_ATTRIB | self.IN_CLOSE_WRITE):
+                if name and (directory, name) not in modified:
+                    modified.add((directory, name))
+                    events.append(WatchEvent("modified", directory, name))
+
+        return events
+
+
+class PollingBackend(_Backend):
+    """
+    Watches directories by checking their mtime on an interval.
+
+    A directory is only rescanned when its mtime changes, and then only
+    for names, so idle directories cost one `stat` per interval. Renames
+    show up as a deletion and a creation. The first snapshot of a
+    directory is taken on the polling thread, not by `add`.
+    """
+    def __init__(self, interval: float = 2.0) -> None:
+        self._interval: float = interval
+        self._lock: threading.Lock = threading.Lock()
+        self._snapshots: dict[Path, tuple[int | None, set[str]] | None] = {}
+        self._wake: threading.Event = threading.Event()
+        self._last_poll: float = 0.0
+
+    def add(self, directory: Path) -> None:
+        with self._lock:
+            self._snapshots.setdefault(directory, None)
+
+    def remove(self, directory: Path) -> None:
+        with self._lock:
+            self._snapshots.pop(directory, None)
+
+    def read(self, timeout: float) -> list[WatchEvent]:
+        self._wake.wait(timeout)
+        if time.monotonic() - self._last_poll < self._interval:
+            return []
+
+        self._last_poll = time.monotonic()
+
+        with self._lock:
+            directories: list[Path] = list(self._snapshots)
+
+        events: list[WatchEvent] = []
+        for directory in directories:
+            with self._lock:
+                if directory not in self._snapshots:
+                    continue
+                previous: tuple[int | None, set[str]] | None = (
+                    self._snapshots[directory]
+                )
+
+            if previous is None:
+                self._store(directory, self._snapshot(directory))
+                continue
+
+            mtime: int | None = files.directory_mtime(directory)
+            if mtime is None:
+                events.append(WatchEvent("gone", directory))
+                self.remove(directory)
+                continue
+
+            if mtime == previous[0]:
+                continue
+
+            current: tuple[int | None, set[str]] = self._snapshot(directory)
+            events.extend(
+                WatchEvent("created", directory, name)
+                for name in current[1] - previous[1]
+            )
+            events.extend(
+                WatchEvent("deleted", directory, name)
+                for name in previous[1] - current[1]
+            )
+
+            self._store(directory, current)
+
+        return events
+
+    def close(self) -> None:
+        self._wake.set()
+
+    def _store(
+        self,
+        directory: Path,
+        snapshot: tuple[int | None, set[str]]
+    ) -> None:
+        with self._lock:
+            if directory in self._snapshots:
+                self._snapshots[directory] = snapshot
+
+    def _snapshot(self, directory: Path) -> tuple[int | None, set[str]]:
+        mtime: int | None = files.directory_mtime(directory)
+        try:
+            result: files.ScanResult = files.scan_directory(
+                directory,
+                use_exact=True,
+                with_stats=False
+            )
+        except OSError:
+            return (mtime, set())
+
+        return (mtime, set(result.entries))
+
+
+class DirectoryWatcher:
+    """
+    Watches the current directory and the most recently visited ones.
+
+    Changes are batched on a background thread and handed to
+    `on_events` on the Tk thread through `App.call_soon`. Created,
+    renamed and modified items come with a fresh `files.Entry`, so
+    callers can update their listings without stat-ing anything
+    themselves.
+    """
+    def __init__(
+        self,
+        app: gui.App,
+        on_events: Callable[[list[WatchEvent]], Any],
+        max_watches: int = 16
+    ) -> None:
+        self._app: gui.App = app
+        self._on_events: Callable[[list[WatchEvent]], Any] = on_events
+        self._max_watches: int = max_watches
+        self._watched: OrderedDict[Path, None] = OrderedDict()
+        # Guards `_watched` and `_backend`, which the worker replaces if
+        # the backend fails while the Tk thread adds and removes watches.
+        self._lock: threading.Lock = threading.Lock()
+        self._stop: threading.Event = threading.Event()
+        self._backend: _Backend = self._create_backend()
+
+        self._thread: threading.Thread = threading.Thread(
+            target=self._worker,
+            daemon=True
+        )
+        self._thread.start()
+
+    def watch(self, directory: Path) -> None:
+        """Starts watching `directory`, dropping the oldest watch if needed."""
+        if directory.exact_path == '':
+            return
+
+        with self._lock:
+            if directory in self._watched:
+                self._watched.move_to_end(directory)
+                return
+
+            try:
+                self._backend.add(directory)
+            except OSError as e:
+                errors.warn(
+                    None,
+                    "Watch failed",
+                    f"{repr(directory)} could not be watched: {e}"
+                )
+                return
+
+            self._watched[directory] = None
+
+            while len(self._watched) > self._max_watches:
+                oldest, _ = self._watched.popitem(last=False)
+                self._backend.remove(oldest)
+
+    def unwatch(self, directory: Path) -> None:
+        with self._lock:
+            if directory not in self._watched:
+                return
+
+            del self._watched[directory]
+            self._backend.remove(directory)
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._backend.close()
+
+    @property
+    def backend_name(self) -> str:
+        return self._backend.__class__.__name__
+
+    def _create_backend(self) -> _Backend:
+        if utils.platform() == "linux":
+            try:
+                return InotifyBackend()
+            except (OSError, AttributeError) as e:
+                errors.warn(
+                    None,
+                    "inotify unavailable",
+                    f"Falling back to polling for directory changes: {e}"
+                )
+
+        return PollingBackend()
+
+    def _worker(self) -> None:
+        while not self._stop.is_set():
+            try:
+                events: list[WatchEvent] = self._backend.read(timeout=0.5)
+            except OSError as e:
+                if self._stop.is_set():
+                    return
+
+                events = self._fall_back(e)
+
+            if not events:
+                continue
+
+            for event in events:
+                name: str = event.new_name or event.name
+                if event.kind in ("created", "renamed", "modified"):
+                    event.entry = files.stat_entry(event.directory, name)
+
+            self._app.call_soon(self._on_events, events)
+
+    def _fall_back(self, error: OSError) -> list[WatchEvent]:
+        """
+        Replaces a backend that failed to read with a `PollingBackend`,
+        watching the same directories. Returns a "rescan" event for each
+        of them, since changes made meanwhile were not seen.
+        """
+        errors.warn(
+            None,
+            "Watch failed",
+            f"{self.backend_name} stopped working, falling back to polling: {error}"
+        )
+
+        with self._lock:
+            try:
+                self._backend.close()
+            except OSError:
+                pass
+
+            self._backend = PollingBackend()
+            directories: list[Path] = list(self._watched)
+            for directory in directories:
+                self._backend.add(directory)
+
+        return [WatchEvent("rescan", directory) for directory in directories]